@@ -5,8 +5,28 @@ A tool that converts natural language descriptions of programming tasks
 into reusable code snippets or functions.
 """
 
-from smart_func.generator import get_function, recommend_functions
-from smart_func.nlp import parse_intent, extract_keywords
-
 __version__ = "0.1.0"
 __all__ = ["get_function", "recommend_functions", "parse_intent", "extract_keywords"]
+
+# Public names and the submodule that provides them. They are imported on
+# first access so that e.g. `smart-func --help` does not load the NLP and
+# database stack.
+_LAZY_EXPORTS = {
+    "get_function": "smart_func.generator",
+    "recommend_functions": "smart_func.generator",
+    "parse_intent": "smart_func.nlp",
+    "extract_keywords": "smart_func.nlp",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_EXPORTS:
+        import importlib
+        value = getattr(importlib.import_module(_LAZY_EXPORTS[name]), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
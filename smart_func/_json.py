@@ -0,0 +1,40 @@
+"""
+JSON helpers for Smart Function Recommender.
+Use orjson when it is installed and the standard library otherwise. Shared
+by the database backends and the test scripts, so they read and write the
+same format.
+"""
+
+import json
+
+try:
+    import orjson  # Optional: much faster JSON parsing and serialization
+except ImportError:
+    orjson = None
+
+
+def json_loads(data: bytes):
+    """Parse a JSON document, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def json_dumps(obj, indent: int = 0) -> bytes:
+    """
+    Serialize to UTF-8 JSON, with orjson when it is installed.
+    
+    Args:
+        obj: Object to serialize
+        indent: Spaces per indentation level, or 0 for compact output
+    """
+    if orjson is not None and indent in (0, 2):
+        # Non-str keys (e.g. None) are written as strings, as json.dumps does
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        try:
+            return orjson.dumps(obj, option=option)
+        except TypeError:
+            pass  # e.g. integers over 64 bits, use the stdlib
+    if indent:
+        return json.dumps(obj, indent=indent, ensure_ascii=False).encode('utf-8')
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
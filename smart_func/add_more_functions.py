@@ -3,8 +3,13 @@ Script to add more functions to improve accuracy.
 Focus on Python and JavaScript functions that are commonly requested.
 """
 
-import json
 import os
+import sys
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from smart_func.database import SQLiteBackend
 
 # Additional functions to add
 additional_functions = [
@@ -117,28 +122,14 @@ additional_functions = [
     }
 ]
 
-def add_functions():
-    """Add additional functions to database."""
-    db_path = os.path.join(os.path.dirname(__file__), 'database.json')
-    
-    with open(db_path, 'r', encoding='utf-8') as f:
-        functions = json.load(f)
-    
-    # Check which functions already exist
-    existing_ids = {f.get('id') for f in functions}
-    
-    added = 0
-    for func in additional_functions:
-        if func['id'] not in existing_ids:
-            functions.append(func)
-            added += 1
-    
-    # Save updated database
-    with open(db_path, 'w', encoding='utf-8') as f:
-        json.dump(functions, f, indent=2, ensure_ascii=False)
+def add_functions(db_path: str = None):
+    """Add additional functions to the SQLite database in a single transaction."""
+    backend = SQLiteBackend(db_path)
+    added = backend.add_functions_bulk(additional_functions)
+    total = backend.get_stats()['total_functions']
     
     print(f"Added {added} new functions")
-    print(f"Total functions: {len(functions)}")
+    print(f"Total functions: {total}")
     
     return added
 
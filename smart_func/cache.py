@@ -3,146 +3,342 @@ Caching layer for Smart Function Recommender.
 Supports in-memory caching and optional Redis backend.
 """
 
+import sys
 import time
 import hashlib
-import json
-from typing import Optional, Dict, Any, Callable
+import inspect
+import pickle
+import weakref
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Callable, Hashable, Tuple
 from functools import wraps
 import threading
+from contextvars import ContextVar, Token
+
+
+try:
+    import xxhash  # Optional: much faster non-cryptographic hashing
+except ImportError:
+    xxhash = None
+
+try:
+    import orjson  # Optional: much faster canonical serialization of key data
+except ImportError:
+    orjson = None
+
+# Argument types that are cheap to hash and safe to use directly in a key tuple
+_PRIMITIVE_TYPES = (str, int, float, bool, type(None))
+
+# Number of independently locked partitions per cache (must be a power of two)
+_NUM_SHARDS = 16
+
+# Caches smaller than this many entries per shard use a single shard, so
+# that their LRU order is exact
+_MIN_SHARD_ENTRIES = 64
+
+
+class _CacheShard:
+    """One independently locked LRU partition of a Cache."""
+    
+    __slots__ = ('lock', 'entries', 'total_bytes')
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Entries are (value, expires_at_ns, size_bytes) tuples, oldest first
+        self.entries: "OrderedDict[Hashable, Tuple[Any, float, int]]" = OrderedDict()
+        self.total_bytes = 0
+    
+    def get(self, key: Hashable) -> Optional[Any]:
+        # Lock-free lookup; the lock is only needed to update LRU order
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        
+        if entry[1] > time.monotonic_ns():
+            with self.lock:
+                if key in self.entries:
+                    self.entries.move_to_end(key)
+            return entry[0]
+        
+        with self.lock:
+            if self.entries.get(key) is entry:
+                del self.entries[key]
+                self.total_bytes -= entry[2]
+        return None
+    
+    def set(self, key: Hashable, value: Any, expires_at: int, size: int) -> bool:
+        """Store an entry; returns True if the key was not cached before."""
+        with self.lock:
+            old_entry = self.entries.get(key)
+            if old_entry is not None:
+                self.total_bytes -= old_entry[2]
+            self.entries[key] = (value, expires_at, size)
+            self.entries.move_to_end(key)
+            self.total_bytes += size
+            return old_entry is None
+    
+    def evict_oldest(self) -> None:
+        with self.lock:
+            if self.entries:
+                _, evicted = self.entries.popitem(last=False)
+                self.total_bytes -= evicted[2]
+    
+    def delete(self, key: Hashable) -> None:
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is not None:
+                self.total_bytes -= entry[2]
+    
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+    
+    def cleanup_expired(self, current_time: int) -> None:
+        with self.lock:
+            expired_keys = [
+                key for key, entry in self.entries.items()
+                if entry[1] <= current_time
+            ]
+            
+            for key in expired_keys:
+                self.total_bytes -= self.entries.pop(key)[2]
 
 
 class Cache:
-    """Simple in-memory cache with TTL."""
+    """Simple in-memory LRU cache with TTL, sharded to reduce lock contention."""
     
-    def __init__(self, default_ttl: int = 300):
+    def __init__(self, default_ttl: int = 300, max_size: int = 1024):
         """
         Initialize cache.
         
         Args:
             default_ttl: Default time-to-live in seconds (default: 5 minutes)
+            max_size: Maximum number of entries before least recently used ones are evicted
         """
         self.default_ttl = default_ttl
-        self._cache: Dict[str, Dict[str, Any]] = {}
-        self._lock = threading.RLock()
+        self.max_size = max_size
+        # Each shard has its own lock; max_size applies to all shards together
+        num_shards = _NUM_SHARDS if max_size >= _NUM_SHARDS * _MIN_SHARD_ENTRIES else 1
+        self._shards = tuple(_CacheShard() for _ in range(num_shards))
+        self._shard_mask = num_shards - 1
         self._cleanup_interval = 60  # Cleanup every minute
-        self._last_cleanup = time.time()
+        self._sweeper: Optional[threading.Thread] = None
+        self._sweeper_lock = threading.Lock()
+    
+    def _shard(self, key: Hashable) -> _CacheShard:
+        return self._shards[hash(key) & self._shard_mask]
     
     def _make_key(self, *args, **kwargs) -> str:
         """Create a cache key from arguments."""
-        key_data = json.dumps({'args': args, 'kwargs': kwargs}, sort_keys=True)
-        return hashlib.md5(key_data.encode()).hexdigest()
+        key_data = None
+        if orjson is not None:
+            try:
+                key_data = orjson.dumps({'args': args, 'kwargs': kwargs}, option=orjson.OPT_SORT_KEYS)
+            except TypeError:
+                pass  # Not JSON serializable (e.g. custom objects), use pickle
+        if key_data is None:
+            key_data = pickle.dumps((args, sorted(kwargs.items())), protocol=pickle.HIGHEST_PROTOCOL)
+        
+        if xxhash is not None:
+            return xxhash.xxh3_64(key_data).hexdigest()
+        return hashlib.blake2b(key_data, digest_size=8).hexdigest()
     
-    def get(self, key: str) -> Optional[Any]:
+    def get(self, key: Hashable) -> Optional[Any]:
         """Get a value from cache."""
-        with self._lock:
-            self._cleanup_expired()
-            
-            if key in self._cache:
-                entry = self._cache[key]
-                if entry['expires_at'] > time.time():
-                    return entry['value']
-                else:
-                    del self._cache[key]
-            
-            return None
+        return self._shard(key).get(key)
     
-    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+    def set(self, key: Hashable, value: Any, ttl: Optional[int] = None) -> None:
         """Set a value in cache."""
-        with self._lock:
-            if ttl is None:
-                ttl = self.default_ttl
-            
-            self._cache[key] = {
-                'value': value,
-                'expires_at': time.time() + ttl,
-                'created_at': time.time()
-            }
+        if ttl is None:
+            ttl = self.default_ttl
+        
+        # Monotonic integer nanoseconds: immune to wall-clock jumps, cheap to compare
+        expires_at = time.monotonic_ns() + int(ttl * 1_000_000_000)
+        shard = self._shard(key)
+        if shard.set(key, value, expires_at, _sizeof(value)) and \
+           sum(len(other.entries) for other in self._shards) > self.max_size:
+            # Evict the least recently used entry of this shard, unless the new
+            # entry is its only one; then make room in the fullest shard
+            if len(shard.entries) <= 1:
+                shard = max(self._shards, key=lambda other: len(other.entries))
+            shard.evict_oldest()
+        
+        if self._sweeper is None:
+            self._start_sweeper()
     
-    def delete(self, key: str) -> None:
+    def delete(self, key: Hashable) -> None:
         """Delete a key from cache."""
-        with self._lock:
-            if key in self._cache:
-                del self._cache[key]
+        self._shard(key).delete(key)
     
     def clear(self) -> None:
         """Clear all cache entries."""
-        with self._lock:
-            self._cache.clear()
+        for shard in self._shards:
+            shard.clear()
     
     def _cleanup_expired(self) -> None:
-        """Remove expired entries."""
-        current_time = time.time()
-        
-        # Only cleanup every minute to avoid overhead
-        if current_time - self._last_cleanup < self._cleanup_interval:
-            return
-        
-        self._last_cleanup = current_time
-        
-        expired_keys = [
-            key for key, entry in self._cache.items()
-            if entry['expires_at'] <= current_time
-        ]
-        
-        for key in expired_keys:
-            del self._cache[key]
+        """Remove expired entries, one shard at a time."""
+        current_time = time.monotonic_ns()
+
+        for shard in self._shards:
+            shard.cleanup_expired(current_time)
+    
+    def _start_sweeper(self) -> None:
+        """Start the background thread that removes expired entries."""
+        with self._sweeper_lock:
+            if self._sweeper is not None:
+                return
+            self._sweeper = threading.Thread(
+                target=_sweep_expired,
+                args=(weakref.ref(self), self._cleanup_interval),
+                name='smart-func-cache-sweeper',
+                daemon=True
+            )
+        self._sweeper.start()
     
     def get_stats(self) -> Dict[str, Any]:
         """Get cache statistics."""
-        with self._lock:
-            self._cleanup_expired()
-            
-            total_size = len(self._cache)
-            total_memory = sum(
-                len(json.dumps(entry['value']).encode())
-                for entry in self._cache.values()
-            )
-            
-            return {
-                'entries': total_size,
-                'memory_bytes': total_memory,
-                'memory_mb': round(total_memory / 1024 / 1024, 2)
-            }
+        # Summed shard by shard; never holds more than one shard lock
+        total_size = 0
+        total_memory = 0
+        for shard in self._shards:
+            with shard.lock:
+                total_size += len(shard.entries)
+                total_memory += shard.total_bytes
+        
+        return {
+            'entries': total_size,
+            'memory_bytes': total_memory,
+            'memory_mb': round(total_memory / 1024 / 1024, 2)
+        }
+
+
+def _sizeof(value: Any) -> int:
+    """Approximate the size of a cached value in bytes, computed once at insert."""
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(value)
+
+
+def _sweep_expired(cache_ref: "weakref.ref[Cache]", interval: float) -> None:
+    """Periodically clean up a cache until it is garbage collected."""
+    while True:
+        time.sleep(interval)
+        cache = cache_ref()
+        if cache is None:
+            return
+        cache._cleanup_expired()
+        del cache
 
 
 # Global cache instance
 _cache = Cache(default_ttl=300)  # 5 minutes default TTL
 
+# Cache used by @cached in the current context. Servers can install a
+# per-worker cache, and None disables caching entirely.
+_cache_var: ContextVar[Optional[Cache]] = ContextVar('smart_func_cache', default=_cache)
 
-def cached(ttl: int = 300, key_prefix: str = ''):
+
+def cached(ttl: int = 300, key_prefix: str = '', key_args: Optional[Tuple[str, ...]] = None):
     """
     Decorator to cache function results.
     
     Args:
         ttl: Time-to-live in seconds
         key_prefix: Prefix for cache keys
+        key_args: Names of the arguments that make up the cache key (default: all).
+            Calls that pass any other argument with a non-default value bypass the cache.
     """
     def decorator(func: Callable) -> Callable:
+        if key_args is not None:
+            # (position, name, default) of every parameter, resolved once
+            params = [
+                (position, param.name, param.default)
+                for position, param in enumerate(inspect.signature(func).parameters.values())
+            ]
+            key_params = [param for param in params if param[1] in key_args]
+            other_params = [param for param in params if param[1] not in key_args]
+            param_names = frozenset(param[1] for param in params)
+        
         @wraps(func)
         def wrapper(*args, **kwargs):
-            # Create cache key
-            cache_key = f"{key_prefix}:{func.__name__}:{_cache._make_key(*args, **kwargs)}"
+            cache = _cache_var.get()
+            if cache is None:
+                return func(*args, **kwargs)
             
-            # Try to get from cache
-            result = _cache.get(cache_key)
-            if result is not None:
-                return result
+            if key_args is None:
+                return _cached_call(cache, func, key_prefix, ttl, args, kwargs, args, kwargs)
             
-            # Call function and cache result
-            result = func(*args, **kwargs)
-            _cache.set(cache_key, result, ttl)
-            
-            return result
+            # Key on the selected arguments only, normalized so positional and
+            # keyword calls share entries
+            if not param_names.issuperset(kwargs):
+                return func(*args, **kwargs)
+            for position, name, default in other_params:
+                value = args[position] if position < len(args) else kwargs.get(name, default)
+                if value is not default:
+                    return func(*args, **kwargs)
+            key_values = tuple(
+                args[position] if position < len(args) else kwargs.get(name, default)
+                for position, name, default in key_params
+            )
+            return _cached_call(cache, func, key_prefix, ttl, key_values, {}, args, kwargs)
         
         return wrapper
     return decorator
 
 
-def get_cache() -> Cache:
-    """Get the global cache instance."""
-    return _cache
+def _cached_call(cache: Cache, func: Callable, key_prefix: str, ttl: int,
+                 key_args: tuple, key_kwargs: Dict[str, Any], args: tuple, kwargs: Dict[str, Any]) -> Any:
+    """Return the cached result for the key arguments, calling func(*args, **kwargs) on a miss."""
+    # Create cache key (primitive arguments are used as-is, no hashing needed).
+    # Their types are part of the key: 1, 1.0 and True are equal and hash alike.
+    if all(isinstance(arg, _PRIMITIVE_TYPES) for arg in key_args) and \
+       all(isinstance(value, _PRIMITIVE_TYPES) for value in key_kwargs.values()):
+        cache_key = (
+            key_prefix, func.__name__, key_args, tuple(map(type, key_args)),
+            tuple((name, type(value), value) for name, value in sorted(key_kwargs.items())) if key_kwargs else ()
+        )
+    else:
+        cache_key = f"{key_prefix}:{func.__name__}:{cache._make_key(*key_args, **key_kwargs)}"
+    
+    # Try to get from cache
+    result = cache.get(cache_key)
+    if result is not None:
+        return result
+    
+    # Call function and cache result
+    result = func(*args, **kwargs)
+    cache.set(cache_key, result, ttl)
+    
+    return result
+
+
+def get_cache() -> Optional[Cache]:
+    """Get the cache used in the current context (None if caching is disabled)."""
+    return _cache_var.get()
+
+
+def set_cache(cache: Optional[Cache]) -> Token:
+    """
+    Install the cache used by @cached in the current context.
+    
+    Args:
+        cache: Cache instance to use, or None to disable caching
+    
+    Returns:
+        Token that can be passed to reset_cache() to restore the previous cache
+    """
+    return _cache_var.set(cache)
+
+
+def reset_cache(token: Token) -> None:
+    """Restore the cache that was active before the matching set_cache() call."""
+    _cache_var.reset(token)
 
 
 def clear_cache() -> None:
-    """Clear the global cache."""
-    _cache.clear()
+    """Clear the cache used in the current context."""
+    cache = _cache_var.get()
+    if cache is not None:
+        cache.clear()
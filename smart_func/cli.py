@@ -2,13 +2,14 @@
 CLI interface for Smart Function Recommender.
 """
 
-import argparse
 import sys
-from smart_func.generator import get_function, recommend_functions, format_recommendation
+from typing import Optional
 
 
-def main():
-    """Main CLI entry point."""
+def _build_parser():
+    """Build the argument parser (only needed when flags are given)."""
+    import argparse
+    
     parser = argparse.ArgumentParser(
         description='Smart Function Recommender - Get code snippets from natural language descriptions',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -53,12 +54,21 @@ Examples:
         help='Filter by programming language (default: all languages)'
     )
     
-    args = parser.parse_args()
+    return parser
+
+
+def _run(query: str, top: int = 1, code_only: bool = False, as_json: bool = False, lang: Optional[str] = None):
+    """Look up recommendations for a query and print them."""
+    # Imported only after argument parsing so --help never loads the
+    # NLP/database stack
+    from smart_func.generator import get_function, recommend_functions, format_recommendation
+    if as_json:
+        import json
     
     try:
-        if args.top == 1:
+        if top == 1:
             # Single recommendation
-            result = get_function(args.query, top_k=1, language=args.lang)
+            result = get_function(query, top_k=1, language=lang)
             
             if result is None:
                 print("No matching function found. Try rephrasing your query.", file=sys.stderr)
@@ -66,29 +76,27 @@ Examples:
             
             # Warn if relevance is very low (might be a poor match)
             relevance = result.get('relevance_score', 0)
-            if relevance < 0.4 and not args.code_only:
+            if relevance < 0.4 and not code_only:
                 print(f"\n⚠️  Warning: Low relevance score ({relevance:.1%}). This might not be the best match.", file=sys.stderr)
                 print("Consider rephrasing your query or checking if the function exists in the database.\n", file=sys.stderr)
             
-            if args.json:
-                import json
+            if as_json:
                 print(json.dumps(result, indent=2))
-            elif args.code_only:
+            elif code_only:
                 print(result.get('code', ''))
             else:
                 print(format_recommendation(result))
         else:
             # Multiple recommendations
-            results = recommend_functions(args.query, top_k=args.top, language=args.lang)
+            results = recommend_functions(query, top_k=top, language=lang)
             
             if not results:
                 print("No matching functions found. Try rephrasing your query.", file=sys.stderr)
                 sys.exit(1)
             
-            if args.json:
-                import json
+            if as_json:
                 print(json.dumps(results, indent=2))
-            elif args.code_only:
+            elif code_only:
                 for i, func in enumerate(results, 1):
                     print(f"# Option {i}")
                     print(func.get('code', ''))
@@ -105,5 +113,17 @@ Examples:
         sys.exit(1)
 
 
+def main():
+    """Main CLI entry point."""
+    # Fast path for the common `smart-func "some query"` call: a single
+    # positional argument needs no argparse at all
+    if len(sys.argv) == 2 and not sys.argv[1].startswith('-'):
+        _run(sys.argv[1])
+        return
+    
+    args = _build_parser().parse_args()
+    _run(args.query, top=args.top, code_only=args.code_only, as_json=args.json, lang=args.lang)
+
+
 if __name__ == '__main__':
     main()
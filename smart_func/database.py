@@ -3,15 +3,189 @@ Database layer for Smart Function Recommender.
 Supports both JSON (development) and SQLite (production) backends.
 """
 
-import json
 import os
+import queue
+import re
 import sqlite3
+import sys
+import tempfile
 from typing import List, Dict, Optional
 from contextlib import contextmanager
 import threading
+from collections import Counter
 
-# Thread-local storage for database connections
-_local = threading.local()
+from smart_func._json import json_dumps, json_loads
+
+
+_FTS_TOKEN_RE = re.compile(r'\w+')
+
+# Selects a function's keywords as one char(31)-separated string, in insertion
+# order, so rows come back in a single query instead of one query per function
+_KEYWORDS_COLUMN = '''(
+    SELECT group_concat(keyword, char(31)) FROM (
+        SELECT keyword FROM keywords WHERE function_id = f.id ORDER BY id
+    )
+) AS keywords_concat'''
+
+# Hot-path statements, defined once so the same SQL text is reused on every
+# call and hits the connection's prepared-statement cache
+_SELECT_FUNCTIONS_SQL = f'SELECT f.*, {_KEYWORDS_COLUMN} FROM functions f ORDER BY f.popularity DESC'
+_SELECT_FUNCTIONS_BY_LANGUAGE_SQL = (
+    f'SELECT f.*, {_KEYWORDS_COLUMN} FROM functions f WHERE f.language = ? ORDER BY f.popularity DESC'
+)
+_SELECT_FUNCTION_BY_ID_SQL = f'SELECT f.*, {_KEYWORDS_COLUMN} FROM functions f WHERE f.id = ?'
+_FUNCTION_EXISTS_SQL = 'SELECT id FROM functions WHERE id = ?'
+_INSERT_FUNCTION_SQL = '''
+    INSERT INTO functions
+    (id, name, description, code, language, action, data_type, order_type, usage, complexity, popularity)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+_INSERT_OR_IGNORE_FUNCTION_SQL = _INSERT_FUNCTION_SQL.replace('INSERT INTO', 'INSERT OR IGNORE INTO')
+_UPDATE_FUNCTION_SQL = '''
+    UPDATE functions SET
+        name = ?, description = ?, code = ?, language = ?,
+        action = ?, data_type = ?, order_type = ?, usage = ?,
+        complexity = ?, popularity = ?, updated_at = CURRENT_TIMESTAMP
+    WHERE id = ?
+'''
+_INSERT_KEYWORD_SQL = 'INSERT INTO keywords (function_id, keyword) VALUES (?, ?)'
+_DELETE_KEYWORDS_SQL = 'DELETE FROM keywords WHERE function_id = ?'
+
+# Prepared statements kept per connection (the sqlite3 default is 128)
+_CACHED_STATEMENTS = 256
+
+# Applied once to every new connection: WAL lets readers proceed while a
+# writer is active, and the larger page cache and mmap keep the function
+# and FTS tables resident for the read-heavy recommender workload. The busy
+# timeout comes first so that switching a file to WAL waits for other
+# processes instead of failing.
+_CONNECTION_PRAGMAS = '''
+    PRAGMA busy_timeout=5000;
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA cache_size=-32000;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA mmap_size=268435456;
+'''
+
+# Keep functions_fts in sync with the functions and keywords tables. Run one
+# statement at a time (not executescript, which would commit) so schema setup
+# stays in a single transaction.
+_FTS_TRIGGERS = (
+    '''
+    CREATE TRIGGER IF NOT EXISTS functions_fts_insert AFTER INSERT ON functions BEGIN
+        INSERT INTO functions_fts (rowid, name, description, keywords)
+        VALUES (new.rowid, new.name, new.description, '');
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS functions_fts_update AFTER UPDATE OF name, description ON functions BEGIN
+        UPDATE functions_fts SET name = new.name, description = new.description
+        WHERE rowid = new.rowid;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS functions_fts_delete AFTER DELETE ON functions BEGIN
+        DELETE FROM functions_fts WHERE rowid = old.rowid;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS keywords_fts_insert AFTER INSERT ON keywords BEGIN
+        UPDATE functions_fts SET keywords = (
+            SELECT group_concat(keyword, ' ') FROM keywords WHERE function_id = new.function_id
+        )
+        WHERE rowid = (SELECT rowid FROM functions WHERE id = new.function_id);
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS keywords_fts_delete AFTER DELETE ON keywords BEGIN
+        UPDATE functions_fts SET keywords = coalesce((
+            SELECT group_concat(keyword, ' ') FROM keywords WHERE function_id = old.function_id
+        ), '')
+        WHERE rowid = (SELECT rowid FROM functions WHERE id = old.function_id);
+    END
+    ''',
+)
+
+# Every table, index and trigger created by SQLiteBackend._init_database
+_SCHEMA_OBJECTS = frozenset({
+    'functions', 'keywords', 'functions_fts',
+    'idx_language', 'idx_lang_pop', 'idx_action', 'idx_data_type', 'idx_keyword', 'idx_function_keyword',
+    'functions_fts_insert', 'functions_fts_update', 'functions_fts_delete',
+    'keywords_fts_insert', 'keywords_fts_delete',
+})
+
+# Seconds to wait for a free pooled connection (matches busy_timeout)
+_POOL_TIMEOUT = 5
+
+# Fields with a small set of repeated values (e.g. 'python', 'string')
+_INTERNED_FIELDS = ('language', 'action', 'data_type', 'order', 'complexity')
+
+
+def _intern_fields(func: Dict) -> Dict:
+    """
+    Intern the enum-like string fields and keywords of a function in place.
+    
+    Every record then shares one str object per distinct value, which saves
+    memory and makes equality checks on these fields pointer comparisons.
+    """
+    for field in _INTERNED_FIELDS:
+        value = func.get(field)
+        if type(value) is str:
+            func[field] = sys.intern(value)
+    keywords = func.get('keywords')
+    if keywords:
+        func['keywords'] = [sys.intern(keyword) if type(keyword) is str else keyword for keyword in keywords]
+    return func
+
+
+def _build_keyword_index(functions: List[Dict]) -> Dict[str, List[int]]:
+    """Map each lowercased keyword to the positions of the functions that have it."""
+    index = {}
+    for position, func in enumerate(functions):
+        for keyword in dict.fromkeys(keyword.lower() for keyword in func.get('keywords', [])):
+            index.setdefault(keyword, []).append(position)
+    return index
+
+
+def _trigrams(text: str) -> set:
+    """Return the set of 3-character substrings of a string."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _build_trigram_index(search_index: List[tuple]) -> Dict[str, set]:
+    """
+    Map each trigram of the prelowered search fields to the positions containing it.
+    
+    A substring of three or more characters can only occur in a function
+    whose fields contain every one of its trigrams, so intersecting the
+    postings gives an exact superset of the matches.
+    """
+    index = {}
+    for position, fields in enumerate(search_index):
+        grams = set()
+        for field in fields:
+            grams.update(_trigrams(field))
+        for gram in grams:
+            index.setdefault(gram, set()).add(position)
+    return index
+
+
+def _fts_match_query(query: str) -> str:
+    """
+    Build an FTS5 MATCH expression that matches any word of the query.
+    
+    Every token is quoted so characters like '-' or ':' are never parsed as
+    FTS5 operators.
+    """
+    tokens = dict.fromkeys(_FTS_TOKEN_RE.findall(query.lower()))
+    return ' OR '.join(f'"{token}"' for token in tokens)
+
+
+def _fts_prefix_query(query: str) -> str:
+    """Build an FTS5 MATCH expression requiring every query word as a prefix."""
+    tokens = dict.fromkeys(_FTS_TOKEN_RE.findall(query.lower()))
+    return ' '.join(f'"{token}"*' for token in tokens)
 
 
 class DatabaseBackend:
@@ -22,9 +196,28 @@ class DatabaseBackend:
         raise NotImplementedError
     
     def search_functions(self, query: str, language: Optional[str] = None, limit: int = 100) -> List[Dict]:
-        """Search functions by keywords."""
+        """
+        Search functions by keywords.
+        
+        Matching depends on the backend. JSONBackend returns functions whose
+        name, description or a keyword contains the whole query as a substring,
+        most popular first. SQLiteBackend uses its FTS5 index: every word of
+        the query must start a word of the name, description or keywords
+        ('sort lis' matches 'Sort a list', 'ort' matches nothing), and results
+        are ranked by bm25, then popularity. It falls back to the substring
+        search when FTS5 is unavailable or the query has no words.
+        """
         raise NotImplementedError
     
+    def match_function_ids(self, query: str, language: Optional[str] = None, limit: int = 50) -> Optional[List[str]]:
+        """
+        Get the IDs of the best keyword matches for a query from a full-text index.
+        
+        Returns:
+            List of function IDs, best match first, or None if the backend has no index
+        """
+        return None
+    
     def get_function_by_id(self, func_id: str) -> Optional[Dict]:
         """Get a function by its ID."""
         raise NotImplementedError
@@ -40,6 +233,15 @@ class DatabaseBackend:
     def get_stats(self) -> Dict:
         """Get database statistics."""
         raise NotImplementedError
+    
+    def get_version(self) -> Optional[tuple]:
+        """
+        Get a cheap token that changes whenever the stored data changes.
+        
+        Returns:
+            Hashable version token, or None if changes cannot be detected
+        """
+        return None
 
 
 class JSONBackend(DatabaseBackend):
@@ -49,70 +251,159 @@ class JSONBackend(DatabaseBackend):
         if db_path is None:
             db_path = os.path.join(os.path.dirname(__file__), 'database.json')
         self.db_path = db_path
+        # Writes are compact by default; set SMART_FUNC_JSON_INDENT=2 to keep
+        # the file human-readable
+        self._indent = int(os.environ.get('SMART_FUNC_JSON_INDENT', '0'))
         self._cache = None
-        self._cache_time = 0
+        # get_version() of the file the cache was loaded from
+        self._cache_version = None
+        self._keyword_index = {}
+        # Prelowered (keywords, name, description) per function, parallel to _cache
+        self._search_index = []
+        self._trigram_index = {}
+        # Functions grouped by lowercased language, in catalog order
+        self._by_language = {}
+        # Position in _cache of the first function with each id
+        self._by_id = {}
     
     def _load_data(self) -> List[Dict]:
-        """Load data from JSON file with caching."""
-        import time
-        current_time = time.time()
-        
-        # Cache for 5 seconds
-        if self._cache is None or (current_time - self._cache_time) > 5:
-            with open(self.db_path, 'r', encoding='utf-8') as f:
-                self._cache = json.load(f)
-            self._cache_time = current_time
+        """Load data from JSON file, reparsing only when the file has changed."""
+        version = self.get_version()
+        if self._cache is None or version != self._cache_version:
+            with open(self.db_path, 'rb') as f:
+                self._set_cache(json_loads(f.read()), version)
         
         return self._cache
     
+    def _set_cache(self, data: List[Dict], version: tuple) -> None:
+        """Install freshly loaded or written data as the cache and rebuild its indexes."""
+        for func in data:
+            _intern_fields(func)
+        self._cache = data
+        self._cache_version = version
+        self._keyword_index = _build_keyword_index(data)
+        self._by_language = {}
+        self._by_id = {}
+        for position, func in enumerate(data):
+            self._by_language.setdefault(func.get('language', 'python').lower(), []).append(func)
+            self._by_id.setdefault(func.get('id'), position)
+        self._search_index = [
+            (
+                ' '.join(func.get('keywords', [])).lower(),
+                func.get('name', '').lower(),
+                func.get('description', '').lower()
+            )
+            for func in data
+        ]
+        self._trigram_index = _build_trigram_index(self._search_index)
+    
+    def _write_data(self, data: List[Dict]) -> None:
+        """
+        Atomically replace the JSON file and keep the written data as the cache.
+        
+        The data goes to a temporary file in the same directory first, so
+        readers never observe a partially written database. Each write gets
+        its own uniquely named file, so concurrent writers cannot clobber
+        each other's before it is moved into place.
+        """
+        directory, name = os.path.split(os.path.abspath(self.db_path))
+        fd, temp_path = tempfile.mkstemp(prefix=f'{name}.', suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(json_dumps(data, indent=self._indent))
+                f.flush()
+                os.fsync(f.fileno())
+            # mkstemp creates the file readable by its owner only
+            try:
+                os.chmod(temp_path, os.stat(self.db_path).st_mode & 0o777)
+            except FileNotFoundError:
+                pass
+            os.replace(temp_path, self.db_path)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+        self._set_cache(data, self.get_version())
+    
     def get_functions(self, language: Optional[str] = None) -> List[Dict]:
         data = self._load_data()
         if language:
-            language = language.lower()
-            return [f for f in data if f.get('language', 'python').lower() == language]
+            return self._by_language.get(language.lower(), [])
         return data
     
     def search_functions(self, query: str, language: Optional[str] = None, limit: int = 100) -> List[Dict]:
-        data = self.get_functions(language)
+        data = self._load_data()
         query_lower = query.lower()
+        if language:
+            language = language.lower()
         results = []
         
-        for func in data:
-            # Simple keyword matching
-            keywords = ' '.join(func.get('keywords', [])).lower()
-            name = func.get('name', '').lower()
-            description = func.get('description', '').lower()
+        # Only functions containing every trigram of the query can match;
+        # shorter queries fall back to scanning everything
+        positions = range(len(data))
+        if len(query_lower) >= 3:
+            postings = sorted((self._trigram_index.get(gram, set()) for gram in _trigrams(query_lower)), key=len)
+            positions = sorted(set.intersection(*postings))
+        
+        for position in positions:
+            func = data[position]
+            keywords, name, description = self._search_index[position]
+            if language and func.get('language', 'python').lower() != language:
+                continue
             
+            # Simple keyword matching
             if query_lower in keywords or query_lower in name or query_lower in description:
                 results.append(func)
+                if 0 < limit <= len(results):
+                    break
         
         return results[:limit]
     
+    def match_function_ids(self, query: str, language: Optional[str] = None, limit: int = 50) -> Optional[List[str]]:
+        data = self._load_data()
+        
+        # Rank functions by how many query words are among their keywords
+        matches = Counter()
+        for token in dict.fromkeys(_FTS_TOKEN_RE.findall(query.lower())):
+            matches.update(self._keyword_index.get(token, ()))
+        
+        if language:
+            language = language.lower()
+        
+        results = []
+        for position, _ in matches.most_common():
+            func = data[position]
+            if language and func.get('language', 'python').lower() != language:
+                continue
+            results.append(func.get('id'))
+            if len(results) == limit:
+                break
+        return results
+    
     def get_function_by_id(self, func_id: str) -> Optional[Dict]:
         data = self._load_data()
-        for func in data:
-            if func.get('id') == func_id:
-                return func
-        return None
+        position = self._by_id.get(func_id)
+        if position is None:
+            return None
+        return data[position]
     
     def add_function(self, func: Dict) -> bool:
         data = self._load_data()
         data.append(func)
-        with open(self.db_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
-        self._cache = None  # Clear cache
+        self._write_data(data)
         return True
     
     def update_function(self, func_id: str, func: Dict) -> bool:
         data = self._load_data()
-        for i, f in enumerate(data):
-            if f.get('id') == func_id:
-                data[i] = func
-                with open(self.db_path, 'w', encoding='utf-8') as f:
-                    json.dump(data, f, indent=2, ensure_ascii=False)
-                self._cache = None  # Clear cache
-                return True
-        return False
+        position = self._by_id.get(func_id)
+        if position is None:
+            return False
+        
+        data[position] = func
+        self._write_data(data)
+        return True
     
     def get_stats(self) -> Dict:
         data = self._load_data()
@@ -125,67 +416,220 @@ class JSONBackend(DatabaseBackend):
             'total_functions': len(data),
             'languages': languages
         }
+    
+    def get_version(self) -> Optional[tuple]:
+        stat = os.stat(self.db_path)
+        return (stat.st_mtime_ns, stat.st_size)
 
 
 class SQLiteBackend(DatabaseBackend):
     """SQLite database backend (for production)."""
     
-    def __init__(self, db_path: str = None):
+    def __init__(self, db_path: str = None, pool_size: Optional[int] = None, memory_replica: bool = True):
+        """
+        Initialize the backend.
+        
+        Args:
+            db_path: Path to the SQLite database file
+            pool_size: Maximum number of open connections (default: 2 per CPU, at most 8)
+            memory_replica: Serve reads from an in-memory copy of the database
+        """
         if db_path is None:
             db_path = os.path.join(os.path.dirname(__file__), 'functions.db')
         self.db_path = db_path
+        if pool_size is None:
+            pool_size = min((os.cpu_count() or 1) * 2, 8)
+        # Bounded pool of connections shared by all threads. Slots start out
+        # as None and are opened on first checkout, so idle backends hold no
+        # file handles.
+        self._pool: "queue.Queue[Optional[sqlite3.Connection]]" = queue.Queue(maxsize=pool_size)
+        for _ in range(pool_size):
+            self._pool.put(None)
+        # Connection currently checked out by each thread, so nested calls
+        # reuse it instead of taking a second slot
+        self._checked_out = threading.local()
+        # In-memory copies of the database used for reads, one per thread so
+        # that reads never wait on each other. Each is re-copied from the file
+        # when get_version() or the write generation changes.
+        self._replica_enabled = memory_replica
+        self._replicas = threading.local()
+        self._replica_generation = 0
+        self._replica_lock = threading.Lock()
+        # Connection used only by get_version(), opened on first use
+        self._version_connection: Optional[sqlite3.Connection] = None
+        self._version_lock = threading.Lock()
         self._init_database()
     
+    def _connect(self) -> sqlite3.Connection:
+        """Open and configure a new pooled connection."""
+        connection = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=_CACHED_STATEMENTS)
+        connection.row_factory = sqlite3.Row
+        connection.executescript(_CONNECTION_PRAGMAS)
+        return connection
+    
     @contextmanager
     def _get_connection(self):
-        """Get a thread-local database connection."""
-        if not hasattr(_local, 'connection'):
-            _local.connection = sqlite3.connect(self.db_path, check_same_thread=False)
-            _local.connection.row_factory = sqlite3.Row
-        yield _local.connection
+        """Check a connection out of the pool for the duration of the block."""
+        connection = getattr(self._checked_out, 'connection', None)
+        if connection is not None:
+            yield connection
+            return
+        
+        try:
+            connection = self._pool.get(timeout=_POOL_TIMEOUT)
+        except queue.Empty:
+            raise sqlite3.OperationalError('Timed out waiting for a database connection')
+        
+        try:
+            if connection is None:
+                connection = self._connect()
+            self._checked_out.connection = connection
+            yield connection
+        finally:
+            self._checked_out.connection = None
+            # Never hand a connection with an open transaction to another caller
+            if connection is not None and connection.in_transaction:
+                connection.rollback()
+            self._pool.put(connection)
+    
+    @contextmanager
+    def _read_connection(self):
+        """Connection for read-only queries: the in-memory replica when available."""
+        # Inside a pooled block (e.g. a write in progress) keep reading from
+        # that connection so its own uncommitted changes are visible
+        if self._replica_enabled and getattr(self._checked_out, 'connection', None) is None:
+            replica = self._refresh_replica()
+            if replica is not None:
+                yield replica
+                return
+        
+        with self._get_connection() as conn:
+            yield conn
+    
+    def _refresh_replica(self) -> Optional[sqlite3.Connection]:
+        """This thread's replica, copied from the file first if the database changed."""
+        # Read before copying, so a write committed during the copy triggers another one
+        version = (self.get_version(), self._replica_generation)
+        replica = getattr(self._replicas, 'connection', None)
+        if replica is not None and version == self._replicas.version:
+            return replica
+        
+        # Copy into a new connection: the old one may still have a query open
+        try:
+            replica = sqlite3.connect(':memory:', cached_statements=_CACHED_STATEMENTS)
+            replica.row_factory = sqlite3.Row
+            with self._get_connection() as conn:
+                conn.backup(replica)
+        except sqlite3.OperationalError:
+            # Transient (file locked, pool busy): read the file this time and retry next read
+            return None
+        except sqlite3.Error:
+            # Fall back to reading the file directly from now on
+            self._replica_enabled = False
+            return None
+        
+        self._replicas.connection = replica
+        self._replicas.version = version
+        return replica
+    
+    def _invalidate_replica(self) -> None:
+        """Force every thread's replica to be re-copied on its next read, after a write."""
+        with self._replica_lock:
+            self._replica_generation += 1
     
     def _init_database(self):
         """Initialize the database schema."""
         with self._get_connection() as conn:
+            # Already set up (the usual case): nothing to write
+            existing = {row[0] for row in conn.execute('SELECT name FROM sqlite_master')}
+            if _SCHEMA_OBJECTS <= existing:
+                self._fts_enabled = True
+                return
+            
+            # All DDL runs in one transaction. IMMEDIATE takes the write lock up
+            # front: a deferred transaction would read the schema first and
+            # then fail at once with "database is locked" when another process
+            # opening the same file holds the write lock, instead of waiting.
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS functions (
+                        id TEXT PRIMARY KEY,
+                        name TEXT NOT NULL,
+                        description TEXT,
+                        code TEXT NOT NULL,
+                        language TEXT DEFAULT 'python',
+                        action TEXT,
+                        data_type TEXT,
+                        order_type TEXT,
+                        usage TEXT,
+                        complexity TEXT,
+                        popularity INTEGER DEFAULT 5,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                ''')
+                
+                conn.execute('''
+                    CREATE TABLE IF NOT EXISTS keywords (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        function_id TEXT NOT NULL,
+                        keyword TEXT NOT NULL,
+                        FOREIGN KEY (function_id) REFERENCES functions(id) ON DELETE CASCADE
+                    )
+                ''')
+                
+                # Create indexes for performance
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_language ON functions(language)')
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_lang_pop ON functions(language, popularity DESC)')
+                
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_action ON functions(action)')
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_data_type ON functions(data_type)')
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_keyword ON keywords(keyword)')
+                conn.execute('CREATE INDEX IF NOT EXISTS idx_function_keyword ON keywords(function_id)')
+                
+                self._fts_enabled = self._init_fts_index(conn)
+    
+    def _init_fts_index(self, conn) -> bool:
+        """
+        Create the FTS5 index over name, description and keywords.
+        
+        Keywords live in their own table, so the index stores its own copy of
+        the text and is kept in sync by triggers on both tables.
+        
+        Returns:
+            False if this SQLite build has no FTS5 support
+        """
+        try:
             conn.execute('''
-                CREATE TABLE IF NOT EXISTS functions (
-                    id TEXT PRIMARY KEY,
-                    name TEXT NOT NULL,
-                    description TEXT,
-                    code TEXT NOT NULL,
-                    language TEXT DEFAULT 'python',
-                    action TEXT,
-                    data_type TEXT,
-                    order_type TEXT,
-                    usage TEXT,
-                    complexity TEXT,
-                    popularity INTEGER DEFAULT 5,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
+                CREATE VIRTUAL TABLE IF NOT EXISTS functions_fts
+                USING fts5(name, description, keywords)
             ''')
-            
+        except sqlite3.OperationalError:
+            return False
+        
+        for trigger in _FTS_TRIGGERS:
+            conn.execute(trigger)
+        
+        # Backfill databases created before the index existed
+        indexed = conn.execute('SELECT COUNT(*) FROM functions_fts').fetchone()[0]
+        total = conn.execute('SELECT COUNT(*) FROM functions').fetchone()[0]
+        if indexed != total:
+            conn.execute('DELETE FROM functions_fts')
             conn.execute('''
-                CREATE TABLE IF NOT EXISTS keywords (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    function_id TEXT NOT NULL,
-                    keyword TEXT NOT NULL,
-                    FOREIGN KEY (function_id) REFERENCES functions(id) ON DELETE CASCADE
-                )
+                INSERT INTO functions_fts (rowid, name, description, keywords)
+                SELECT f.rowid, f.name, f.description, coalesce((
+                    SELECT group_concat(k.keyword, ' ') FROM keywords k WHERE k.function_id = f.id
+                ), '')
+                FROM functions f
             ''')
-            
-            # Create indexes for performance
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_language ON functions(language)')
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_action ON functions(action)')
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_data_type ON functions(data_type)')
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_keyword ON keywords(keyword)')
-            conn.execute('CREATE INDEX IF NOT EXISTS idx_function_keyword ON keywords(function_id)')
-            
-            conn.commit()
+        
+        return True
     
     def _row_to_dict(self, row) -> Dict:
         """Convert a database row to a dictionary."""
-        return {
+        return _intern_fields({
             'id': row['id'],
             'name': row['name'],
             'description': row['description'],
@@ -197,38 +641,56 @@ class SQLiteBackend(DatabaseBackend):
             'usage': row['usage'],
             'complexity': row['complexity'],
             'popularity': row['popularity']
-        }
+        })
+    
+    def _row_to_function(self, row) -> Dict:
+        """Convert a row selected with _KEYWORDS_COLUMN to a function dictionary."""
+        func = self._row_to_dict(row)
+        keywords = row['keywords_concat']
+        func['keywords'] = [sys.intern(keyword) for keyword in keywords.split('\x1f')] if keywords else []
+        return func
     
     def get_functions(self, language: Optional[str] = None) -> List[Dict]:
-        with self._get_connection() as conn:
+        with self._read_connection() as conn:
             if language:
-                cursor = conn.execute(
-                    'SELECT * FROM functions WHERE language = ? ORDER BY popularity DESC',
-                    (language.lower(),)
-                )
+                cursor = conn.execute(_SELECT_FUNCTIONS_BY_LANGUAGE_SQL, (language.lower(),))
             else:
-                cursor = conn.execute('SELECT * FROM functions ORDER BY popularity DESC')
-            
-            results = []
-            for row in cursor:
-                func = self._row_to_dict(row)
-                # Load keywords
-                keyword_cursor = conn.execute(
-                    'SELECT keyword FROM keywords WHERE function_id = ?',
-                    (func['id'],)
-                )
-                func['keywords'] = [row[0] for row in keyword_cursor]
-                results.append(func)
+                cursor = conn.execute(_SELECT_FUNCTIONS_SQL)
             
-            return results
+            return [self._row_to_function(row) for row in cursor]
     
     def search_functions(self, query: str, language: Optional[str] = None, limit: int = 100) -> List[Dict]:
-        with self._get_connection() as conn:
+        match_query = _fts_prefix_query(query) if self._fts_enabled else ''
+        if not match_query:
+            return self._search_functions_like(query, language, limit)
+        
+        with self._read_connection() as conn:
+            # Full-text search over name, description and keywords
+            sql = f'''
+                SELECT f.*, {_KEYWORDS_COLUMN} FROM functions_fts
+                JOIN functions f ON f.rowid = functions_fts.rowid
+                WHERE functions_fts MATCH ?
+            '''
+            params = [match_query]
+            
+            if language:
+                sql += ' AND f.language = ?'
+                params.append(language.lower())
+            
+            sql += ' ORDER BY bm25(functions_fts), f.popularity DESC LIMIT ?'
+            params.append(limit)
+            
+            cursor = conn.execute(sql, params)
+            return [self._row_to_function(row) for row in cursor]
+    
+    def _search_functions_like(self, query: str, language: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        """Substring search, used when FTS5 is unavailable or the query has no words."""
+        with self._read_connection() as conn:
             query_lower = query.lower()
             
             # Search in keywords, name, and description
-            sql = '''
-                SELECT DISTINCT f.* FROM functions f
+            sql = f'''
+                SELECT DISTINCT f.*, {_KEYWORDS_COLUMN} FROM functions f
                 LEFT JOIN keywords k ON f.id = k.function_id
                 WHERE (
                     k.keyword LIKE ? OR
@@ -246,79 +708,185 @@ class SQLiteBackend(DatabaseBackend):
             params.append(limit)
             
             cursor = conn.execute(sql, params)
-            results = []
-            for row in cursor:
-                func = self._row_to_dict(row)
-                keyword_cursor = conn.execute(
-                    'SELECT keyword FROM keywords WHERE function_id = ?',
-                    (func['id'],)
-                )
-                func['keywords'] = [row[0] for row in keyword_cursor]
-                results.append(func)
+            return [self._row_to_function(row) for row in cursor]
+    
+    def match_function_ids(self, query: str, language: Optional[str] = None, limit: int = 50) -> Optional[List[str]]:
+        if not self._fts_enabled:
+            return None
+        
+        match_query = _fts_match_query(query)
+        if not match_query:
+            return None
+        
+        with self._read_connection() as conn:
+            sql = '''
+                SELECT f.id FROM functions_fts
+                JOIN functions f ON f.rowid = functions_fts.rowid
+                WHERE functions_fts MATCH ?
+            '''
+            params = [match_query]
+            
+            if language:
+                sql += ' AND f.language = ?'
+                params.append(language.lower())
+            
+            sql += ' ORDER BY bm25(functions_fts) LIMIT ?'
+            params.append(limit)
             
-            return results
+            return [row[0] for row in conn.execute(sql, params)]
     
     def get_function_by_id(self, func_id: str) -> Optional[Dict]:
-        with self._get_connection() as conn:
-            cursor = conn.execute('SELECT * FROM functions WHERE id = ?', (func_id,))
+        with self._read_connection() as conn:
+            cursor = conn.execute(_SELECT_FUNCTION_BY_ID_SQL, (func_id,))
             row = cursor.fetchone()
             if row:
-                func = self._row_to_dict(row)
-                keyword_cursor = conn.execute(
-                    'SELECT keyword FROM keywords WHERE function_id = ?',
-                    (func_id,)
-                )
-                func['keywords'] = [row[0] for row in keyword_cursor]
-                return func
+                return self._row_to_function(row)
             return None
     
+    def _insert_functions(self, conn, functions: List[Dict], last_rowid: Optional[int] = None) -> int:
+        """
+        Insert functions and their keywords without committing.
+        
+        Args:
+            conn: Connection to insert with
+            functions: Function dictionaries to insert
+            last_rowid: If given, existing ids are skipped (INSERT OR IGNORE) and
+                keywords are only added for rows with a rowid above this value,
+                i.e. the ones this call inserted
+        
+        Returns:
+            Number of functions inserted
+        """
+        conn.executemany(_INSERT_FUNCTION_SQL if last_rowid is None else _INSERT_OR_IGNORE_FUNCTION_SQL, [
+            (
+                func.get('id'),
+                func.get('name'),
+                func.get('description'),
+                func.get('code'),
+                func.get('language', 'python'),
+                func.get('action'),
+                func.get('data_type'),
+                func.get('order'),
+                func.get('usage'),
+                func.get('complexity'),
+                func.get('popularity', 5)
+            )
+            for func in functions
+        ])
+        
+        if last_rowid is not None:
+            inserted_ids = {row[0] for row in conn.execute('SELECT id FROM functions WHERE rowid > ?', (last_rowid,))}
+            functions = [func for func in functions if func.get('id') in inserted_ids]
+        
+        # Insert keywords
+        conn.executemany(
+            _INSERT_KEYWORD_SQL,
+            [(func.get('id'), keyword.lower()) for func in functions for keyword in func.get('keywords', [])]
+        )
+        return len(functions)
+    
+    def _bulk_insert_json(self, conn, functions: List[Dict], last_rowid: int) -> int:
+        """
+        Insert many functions without committing, using one statement per table.
+        
+        The rows are passed as a single JSON document and unpacked by SQLite's
+        json_each(), so there is no per-row Python to C parameter binding.
+        Existing ids are skipped, and keywords are only added for the rows
+        inserted here (rowid above last_rowid). Keywords must already be
+        lowercased and ids must be unique within the batch.
+        
+        Returns:
+            Number of functions inserted
+        """
+        payload = json_dumps(functions).decode('utf-8')
+        cursor = conn.execute('''
+            INSERT OR IGNORE INTO functions
+            (id, name, description, code, language, action, data_type, order_type, usage, complexity, popularity)
+            SELECT
+                json_extract(value, '$.id'),
+                json_extract(value, '$.name'),
+                json_extract(value, '$.description'),
+                json_extract(value, '$.code'),
+                coalesce(json_extract(value, '$.language'), 'python'),
+                json_extract(value, '$.action'),
+                json_extract(value, '$.data_type'),
+                json_extract(value, '$.order'),
+                json_extract(value, '$.usage'),
+                json_extract(value, '$.complexity'),
+                coalesce(json_extract(value, '$.popularity'), 5)
+            FROM json_each(?)
+        ''', (payload,))
+        inserted = cursor.rowcount
+        conn.execute('''
+            INSERT INTO keywords (function_id, keyword)
+            SELECT fn.id, k.value
+            FROM json_each(?) AS f
+            JOIN functions fn ON fn.id = json_extract(f.value, '$.id') AND fn.rowid > ?,
+            json_each(f.value, '$.keywords') AS k
+        ''', (payload, last_rowid))
+        return inserted
+    
     def add_function(self, func: Dict) -> bool:
         with self._get_connection() as conn:
             try:
-                conn.execute('''
-                    INSERT INTO functions 
-                    (id, name, description, code, language, action, data_type, order_type, usage, complexity, popularity)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    func.get('id'),
-                    func.get('name'),
-                    func.get('description'),
-                    func.get('code'),
-                    func.get('language', 'python'),
-                    func.get('action'),
-                    func.get('data_type'),
-                    func.get('order'),
-                    func.get('usage'),
-                    func.get('complexity'),
-                    func.get('popularity', 5)
-                ))
-                
-                # Insert keywords
-                keywords = func.get('keywords', [])
-                for keyword in keywords:
-                    conn.execute(
-                        'INSERT INTO keywords (function_id, keyword) VALUES (?, ?)',
-                        (func.get('id'), keyword.lower())
-                    )
-                
-                conn.commit()
-                return True
+                # Commits on success, rolls back on any error
+                with conn:
+                    self._insert_functions(conn, [func])
             except sqlite3.IntegrityError:
                 return False
+        self._invalidate_replica()
+        return True
+    
+    def add_functions_bulk(self, functions: List[Dict]) -> int:
+        """
+        Insert many functions in a single transaction, skipping ids that already exist.
+        
+        Args:
+            functions: Function dictionaries to insert
+        
+        Returns:
+            Number of functions inserted
+        """
+        # Later repeats of an id within the batch are dropped; ids already in
+        # the database are skipped by INSERT OR IGNORE
+        batch = {}
+        for func in functions:
+            if func.get('id') not in batch:
+                batch[func.get('id')] = {
+                    **func,
+                    'keywords': [keyword.lower() for keyword in func.get('keywords', [])]
+                }
+        new_functions = list(batch.values())
+        
+        with self._get_connection() as conn:
+            # Bulk-load recipe: no fsync until the single commit at the end
+            conn.execute('PRAGMA synchronous=OFF')
+            try:
+                with conn:
+                    # Take the write lock up front so no other writer can add
+                    # rows between reading the last rowid and inserting
+                    conn.execute('BEGIN IMMEDIATE')
+                    # Rows inserted below get rowids above the current maximum
+                    last_rowid = conn.execute('SELECT coalesce(max(rowid), 0) FROM functions').fetchone()[0]
+                    
+                    try:
+                        inserted = self._bulk_insert_json(conn, new_functions, last_rowid)
+                    except sqlite3.OperationalError:
+                        # SQLite built without the JSON1 functions
+                        inserted = self._insert_functions(conn, new_functions, last_rowid)
+            finally:
+                conn.execute('PRAGMA synchronous=NORMAL')
+        
+        self._invalidate_replica()
+        return inserted
     
     def update_function(self, func_id: str, func: Dict) -> bool:
         with self._get_connection() as conn:
-            cursor = conn.execute('SELECT id FROM functions WHERE id = ?', (func_id,))
+            cursor = conn.execute(_FUNCTION_EXISTS_SQL, (func_id,))
             if not cursor.fetchone():
                 return False
             
-            conn.execute('''
-                UPDATE functions SET
-                    name = ?, description = ?, code = ?, language = ?,
-                    action = ?, data_type = ?, order_type = ?, usage = ?,
-                    complexity = ?, popularity = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            ''', (
+            conn.execute(_UPDATE_FUNCTION_SQL, (
                 func.get('name'),
                 func.get('description'),
                 func.get('code'),
@@ -333,19 +901,19 @@ class SQLiteBackend(DatabaseBackend):
             ))
             
             # Update keywords
-            conn.execute('DELETE FROM keywords WHERE function_id = ?', (func_id,))
-            keywords = func.get('keywords', [])
-            for keyword in keywords:
-                conn.execute(
-                    'INSERT INTO keywords (function_id, keyword) VALUES (?, ?)',
-                    (func_id, keyword.lower())
-                )
+            conn.execute(_DELETE_KEYWORDS_SQL, (func_id,))
+            conn.executemany(
+                _INSERT_KEYWORD_SQL,
+                [(func_id, keyword.lower()) for keyword in func.get('keywords', [])]
+            )
             
             conn.commit()
-            return True
+        
+        self._invalidate_replica()
+        return True
     
     def get_stats(self) -> Dict:
-        with self._get_connection() as conn:
+        with self._read_connection() as conn:
             cursor = conn.execute('SELECT language, COUNT(*) as count FROM functions GROUP BY language')
             languages = {row[0]: row[1] for row in cursor}
             
@@ -357,6 +925,16 @@ class SQLiteBackend(DatabaseBackend):
                 'languages': languages
             }
     
+    def get_version(self) -> Optional[tuple]:
+        # PRAGMA data_version changes whenever another connection commits, but
+        # not for the connection's own commits and not consistently across
+        # connections. So every call asks the same connection, which never
+        # writes: then it sees commits from the pool and other processes alike.
+        with self._version_lock:
+            if self._version_connection is None:
+                self._version_connection = self._connect()
+            return (self._version_connection.execute('PRAGMA data_version').fetchone()[0],)
+    
     def migrate_from_json(self, json_path: str = None):
         """Migrate data from JSON file to SQLite database."""
         if json_path is None:
@@ -366,20 +944,11 @@ class SQLiteBackend(DatabaseBackend):
             print(f"Error: {json_path} not found!")
             return 0
         
-        with open(json_path, 'r', encoding='utf-8') as f:
-            functions = json.load(f)
+        with open(json_path, 'rb') as f:
+            functions = json_loads(f.read())
         
-        migrated = 0
-        skipped = 0
-        for func in functions:
-            # Check if function already exists
-            existing = self.get_function_by_id(func.get('id'))
-            if existing:
-                skipped += 1
-                continue
-            
-            if self.add_function(func):
-                migrated += 1
+        migrated = self.add_functions_bulk(functions)
+        skipped = len(functions) - migrated
         
         if skipped > 0:
             print(f"Skipped {skipped} functions (already exist)")
@@ -389,6 +958,7 @@ class SQLiteBackend(DatabaseBackend):
 
 # Global backend instance
 _backend = None
+_backend_lock = threading.Lock()
 
 
 def get_backend(backend_type: str = 'auto', db_path: str = None) -> DatabaseBackend:
@@ -404,22 +974,27 @@ def get_backend(backend_type: str = 'auto', db_path: str = None) -> DatabaseBack
     if _backend is not None:
         return _backend
     
-    if backend_type == 'auto':
-        # Check if SQLite database exists
-        if db_path is None:
-            db_path = os.path.join(os.path.dirname(__file__), 'functions.db')
+    # Double-checked so concurrent first calls create a single backend
+    with _backend_lock:
+        if _backend is not None:
+            return _backend
         
-        if os.path.exists(db_path):
-            backend_type = 'sqlite'
+        if backend_type == 'auto':
+            # Check if SQLite database exists
+            if db_path is None:
+                db_path = os.path.join(os.path.dirname(__file__), 'functions.db')
+            
+            if os.path.exists(db_path):
+                backend_type = 'sqlite'
+            else:
+                backend_type = 'json'
+        
+        if backend_type == 'sqlite':
+            _backend = SQLiteBackend(db_path)
         else:
-            backend_type = 'json'
-    
-    if backend_type == 'sqlite':
-        _backend = SQLiteBackend(db_path)
-    else:
-        _backend = JSONBackend(db_path)
-    
-    return _backend
+            _backend = JSONBackend(db_path)
+        
+        return _backend
 
 
 def migrate_to_sqlite(json_path: str = None, db_path: str = None):
@@ -2,35 +2,76 @@
 Core function recommender logic.
 """
 
+import heapq
 import os
+import threading
+
 from typing import List, Dict, Optional, Tuple
-from smart_func.nlp import parse_intent, calculate_relevance_score
+from smart_func.nlp import parse_intent_shared, score_functions
 from smart_func.database import get_backend
 from smart_func.cache import cached, get_cache
 
 # Get database backend (auto-detects JSON or SQLite)
 _db_backend = None
+_db_backend_lock = threading.Lock()
+
+# Loaded function catalog, kept as (backend version, functions, functions by
+# language) so it is read once per process and only reloaded when the
+# database changes
+_catalog = None
+
+# Catalogs larger than this are narrowed down with the backend's full-text
+# index before scoring, instead of scoring every function
+PREFILTER_MIN_FUNCTIONS = 500
+PREFILTER_LIMIT = 50
+
+# Query words that hint at descending order, used to break near-ties
+# between the ascending and descending sort_unique functions
+DESC_HINTS = frozenset({'rank', 'top', 'best', 'highest', 'largest', 'biggest'})
 
 def get_database_backend():
     """Get the database backend instance."""
     global _db_backend
     if _db_backend is None:
-        _db_backend = get_backend('auto')
+        with _db_backend_lock:
+            if _db_backend is None:
+                _db_backend = get_backend('auto')
     return _db_backend
 
-def load_database() -> List[Dict]:
+def _load_catalog() -> Tuple[Optional[tuple], List[Dict], Dict[str, List[Dict]]]:
+    """Load the catalog from the backend unless the cached copy is still current."""
+    global _catalog
+    backend = get_database_backend()
+    version = backend.get_version()
+    
+    if version is None or _catalog is None or _catalog[0] != version:
+        functions = backend.get_functions()
+        by_language = {}
+        for func in functions:
+            by_language.setdefault(func.get('language', 'python').lower(), []).append(func)
+        _catalog = (version, functions, by_language)
+    
+    return _catalog
+
+
+def load_database(language: Optional[str] = None) -> List[Dict]:
     """
     Load the function database (from JSON or SQLite).
+    The catalog is cached and reloaded only when the backend reports a change.
+    
+    Args:
+        language: Optional language filter (e.g., 'python', 'javascript')
     
     Returns:
         List of function dictionaries
     """
-    backend = get_database_backend()
-    return backend.get_functions()
+    _, functions, by_language = _load_catalog()
+    if language:
+        return by_language.get(language.lower(), [])
+    return functions
 
 
-@cached(ttl=300, key_prefix='search')
-@cached(ttl=300, key_prefix='search')
+@cached(ttl=300, key_prefix='search', key_args=('query', 'top_k', 'language'))
 def search_functions(query: str, database: Optional[List[Dict]] = None, top_k: int = 5, language: Optional[str] = None) -> List[Dict]:
     """
     Search for relevant functions based on user query.
@@ -45,56 +86,89 @@ def search_functions(query: str, database: Optional[List[Dict]] = None, top_k: i
     Returns:
         List of function dictionaries with relevance scores, sorted by relevance
     """
-    if database is None:
-        database = load_database()
+    # A caller-supplied database is not part of the cache key, so @cached
+    # bypasses the cache for it and only primitive arguments are ever keyed
+    return _score_and_rank(query, database, top_k, language)
+
+
+def _score_and_rank(query: str, database: Optional[List[Dict]], top_k: int, language: Optional[str]) -> List[Dict]:
+    """
+    Score and rank functions for a query, without caching.
+    Call this directly to search a custom database.
+    
+    Args:
+        query: Natural language description of the task
+        database: Database to search, or None to use the loaded catalog
+        top_k: Number of top results to return
+        language: Optional language filter
     
-    # Filter by language if specified
+    Returns:
+        List of function dictionaries with relevance scores, sorted by relevance
+    """
     if language:
         language = language.lower()
-        database = [func for func in database if func.get('language', 'python').lower() == language]
     
     # Parse user intent
-    intent = parse_intent(query)
-    
-    # If language detected in query, filter database first
+    intent = parse_intent_shared(query)
     detected_lang = intent.get('detected_language')
-    if detected_lang:
-        database = [func for func in database if func.get('language', 'python').lower() == detected_lang]
+    
+    use_prefilter = database is None
+    if database is None:
+        # Both the language filter and a language detected in the query
+        # must match, so pick the per-language bucket directly
+        if language and detected_lang and language != detected_lang:
+            database = []
+        else:
+            database = load_database(language or detected_lang)
+    else:
+        # Same rule for a caller-supplied database, applied in a single pass
+        if language and detected_lang and language != detected_lang:
+            database = []
+        elif language or detected_lang:
+            effective_lang = language or detected_lang
+            database = [func for func in database if func.get('language', 'python').lower() == effective_lang]
+    
+    if use_prefilter and len(database) > PREFILTER_MIN_FUNCTIONS:
+        candidate_ids = get_database_backend().match_function_ids(
+            query, language=detected_lang or language, limit=PREFILTER_LIMIT
+        )
+        if candidate_ids:
+            candidate_ids = set(candidate_ids)
+            database = [func for func in database if func.get('id') in candidate_ids]
     
     # Calculate relevance scores for all functions
-    scored_functions = []
-    for func in database:
-        score = calculate_relevance_score(intent, func)
-        scored_functions.append({
-            **func,
-            'relevance_score': score
-        })
+    scored_functions = list(zip(score_functions(intent, database), database))
     
     # Sort by relevance score (descending), then by popularity (descending)
     # But for very close scores, apply tie-breaking logic
-    def sort_key(func):
-        score = func['relevance_score']
+    # Check once whether the query has hints for descending order
+    query_lower = query.lower()
+    has_desc_hint = any(hint in query_lower for hint in DESC_HINTS)
+    
+    def sort_key(item):
+        score, func = item
         popularity = func.get('popularity', 0)
         
         # Special tie-breaking for sort_unique functions when scores are close
-        # Check if query has hints for descending order
-        query_lower = query.lower()
-        desc_hints = ['rank', 'top', 'best', 'highest', 'largest', 'biggest']
-        has_desc_hint = any(hint in query_lower for hint in desc_hints)
-        
-        if func.get('id') == 'sort_desc_unique' and has_desc_hint:
-            # Small boost for descending when hints present
-            score += 0.02
-        elif func.get('id') == 'sort_asc_unique' and has_desc_hint:
-            # Small penalty for ascending when descending hints present
-            score -= 0.02
+        if has_desc_hint:
+            func_id = func.get('id')
+            if func_id == 'sort_desc_unique':
+                # Small boost for descending when hints present
+                score += 0.02
+            elif func_id == 'sort_asc_unique':
+                # Small penalty for ascending when descending hints present
+                score -= 0.02
         
         return (score, popularity)
     
-    scored_functions.sort(key=sort_key, reverse=True)
+    # Select the top k results without sorting the rest (same order as a
+    # stable full sort); the result dicts are only built for those
+    if top_k >= 0:
+        top_functions = heapq.nlargest(top_k, scored_functions, key=sort_key)
+    else:
+        top_functions = sorted(scored_functions, key=sort_key, reverse=True)[:top_k]
     
-    # Return top k results
-    return scored_functions[:top_k]
+    return [{**func, 'relevance_score': score} for score, func in top_functions]
 
 
 def get_function(query: str, top_k: int = 1, min_relevance: float = 0.0, language: Optional[str] = None) -> Optional[Dict]:
@@ -3,8 +3,121 @@ NLP Module for parsing user input and extracting intent/keywords.
 """
 
 import re
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Mapping, Optional
 from collections import Counter
+from functools import lru_cache
+from types import MappingProxyType
+
+
+# Query patterns used by parse_intent, built once at import
+_LANGUAGE_PATTERNS = {
+    'python': ('python', 'py'),
+    'javascript': ('javascript', 'js', 'ecmascript'),
+    'java': ('java',),
+    'csharp': ('csharp', 'c#', 'c sharp', 'dotnet'),
+    'go': ('go', 'golang'),
+    'rust': ('rust',)
+}
+
+# Common action patterns (expanded with more synonyms)
+_ACTION_PATTERNS = {
+    'sort': ('sort', 'order', 'arrange', 'organize', 'rank', 'ranked'),
+    'filter': ('filter', 'find', 'select', 'extract', 'get'),
+    'transform': ('convert', 'transform', 'change', 'modify', 'update'),
+    'calculate': ('calculate', 'compute', 'sum', 'count', 'average', 'total', 'determine', 'get'),
+    'merge': ('merge', 'combine', 'join', 'concatenate', 'unite'),
+    'remove': ('remove', 'delete', 'eliminate', 'drop', 'deduplicate'),
+    'duplicate': ('duplicate', 'copy', 'repeat'),
+    'unique': ('unique', 'distinct', 'deduplicate', 'remove duplicates'),
+    'reverse': ('reverse', 'flip', 'invert'),
+    'search': ('search', 'find', 'locate', 'lookup'),
+    'validate': ('validate', 'check', 'verify', 'test'),
+    'format': ('format', 'formatting', 'style'),
+    'parse': ('parse', 'read', 'extract', 'decode'),
+    'group': ('group', 'organize', 'categorize', 'organize by'),
+}
+
+# Data structure patterns (expanded)
+_DATA_PATTERNS = {
+    'list': ('list', 'array', 'sequence', 'collection'),
+    'dictionary': ('dictionary', 'dict', 'map', 'object', 'key-value'),
+    'string': ('string', 'text', 'str'),
+    'number': ('number', 'num', 'integer', 'int', 'float'),
+    'tuple': ('tuple', 'pair'),
+    'set': ('set', 'collection'),
+}
+
+# Direction/order patterns
+_ORDER_PATTERNS = {
+    'ascending': ('ascending', 'asc', 'increasing', 'low to high', 'small to large'),
+    'descending': ('descending', 'desc', 'decreasing', 'high to low', 'large to small'),
+}
+
+
+def _build_pattern_index(categories: Dict[str, Dict[str, Tuple[str, ...]]]) -> Tuple["re.Pattern", Dict[str, frozenset]]:
+    """
+    Compile every query pattern into one regex that finds all of them in a single scan.
+    
+    The regex tries the longest pattern first at each position, so it
+    reports the longest pattern starting there. Any shorter pattern found
+    at the same position is a prefix of that one, so each pattern maps to
+    the (category, label) pairs of itself and all of its prefixes.
+    
+    Returns:
+        Tuple of (regex, matched pattern -> frozenset of (category, label))
+    """
+    labels_by_pattern = {}
+    for category, label_patterns in categories.items():
+        for label, patterns in label_patterns.items():
+            for pattern in patterns:
+                labels_by_pattern.setdefault(pattern, set()).add((category, label))
+    
+    patterns = sorted(labels_by_pattern, key=len, reverse=True)
+    regex = re.compile('(?=(%s))' % '|'.join(map(re.escape, patterns)))
+    index = {}
+    for pattern in patterns:
+        labels = set()
+        for prefix in patterns:
+            if pattern.startswith(prefix):
+                labels |= labels_by_pattern[prefix]
+        index[pattern] = frozenset(labels)
+    return regex, index
+
+
+_PATTERN_RE, _PATTERN_LABELS = _build_pattern_index({
+    'language': _LANGUAGE_PATTERNS,
+    'action': _ACTION_PATTERNS,
+    'data': _DATA_PATTERNS,
+    'order': _ORDER_PATTERNS,
+})
+
+
+# Common stop words to filter out
+_STOP_WORDS = frozenset({
+    'a', 'an', 'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
+    'of', 'with', 'by', 'from', 'as', 'is', 'are', 'was', 'were', 'be',
+    'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will',
+    'would', 'should', 'could', 'may', 'might', 'must', 'can', 'this',
+    'that', 'these', 'those', 'i', 'you', 'he', 'she', 'it', 'we', 'they',
+    'what', 'which', 'who', 'when', 'where', 'why', 'how', 'all', 'each',
+    'every', 'both', 'few', 'more', 'most', 'other', 'some', 'such', 'no',
+    'nor', 'not', 'only', 'own', 'same', 'so', 'than', 'too', 'very',
+    'just', 'now', 'then', 'here', 'there', 'when', 'where', 'why', 'how'
+})
+
+# Short words that are still meaningful keywords
+_IMPORTANT_SHORT_WORDS = frozenset({'min', 'max', 'asc', 'desc', 'csv', 'str'})
+
+# Candidate keywords: whole lowercase words of three or more letters.
+# Every important short word has at least three letters, so it still matches here
+# and only needs to be exempted from the stop word filter.
+_KEYWORD_RE = re.compile(r'\b[a-z]{3,}\b')
+_KEYWORD_STOP_WORDS = _STOP_WORDS - _IMPORTANT_SHORT_WORDS
+
+# Potential function names written in the query
+_UNDERSCORE_NAME_RE = re.compile(r'\b[a-z_]+_[a-z_]+\b')  # "capitalize_string"
+_CAMEL_CASE_NAME_RE = re.compile(r'\b[a-z]+[A-Z][a-zA-Z]*\b')  # "capitalizeString"
+_WORD_PAIR_RE = re.compile(r'\b([a-z]{3,})\s+([a-z]{3,})\b')  # "capitalize string"
 
 
 def extract_keywords(text: str) -> List[str]:
@@ -17,35 +130,19 @@ def extract_keywords(text: str) -> List[str]:
     Returns:
         List of relevant keywords
     """
-    # Common stop words to filter out
-    stop_words = {
-        'a', 'an', 'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for',
-        'of', 'with', 'by', 'from', 'as', 'is', 'are', 'was', 'were', 'be',
-        'been', 'being', 'have', 'has', 'had', 'do', 'does', 'did', 'will',
-        'would', 'should', 'could', 'may', 'might', 'must', 'can', 'this',
-        'that', 'these', 'those', 'i', 'you', 'he', 'she', 'it', 'we', 'they',
-        'what', 'which', 'who', 'when', 'where', 'why', 'how', 'all', 'each',
-        'every', 'both', 'few', 'more', 'most', 'other', 'some', 'such', 'no',
-        'nor', 'not', 'only', 'own', 'same', 'so', 'than', 'too', 'very',
-        'just', 'now', 'then', 'here', 'there', 'when', 'where', 'why', 'how'
-    }
-    
-    # Convert to lowercase and split into words
-    words = re.findall(r'\b[a-z]+\b', text.lower())
-    
-    # Filter out stop words and short words (but keep important short words)
-    important_short_words = {'min', 'max', 'asc', 'desc', 'csv', 'str'}
-    keywords = [word for word in words if (word not in stop_words and len(word) > 2) or word in important_short_words]
-    
-    # Return unique keywords, preserving order
-    seen = set()
-    unique_keywords = []
-    for word in keywords:
-        if word not in seen:
-            seen.add(word)
-            unique_keywords.append(word)
-    
-    return unique_keywords
+    return list(_extract_keywords(text))
+
+
+@lru_cache(maxsize=4096)
+def _extract_keywords(text: str) -> Tuple[str, ...]:
+    """Memoized extract_keywords; the result is shared, so it is returned as a tuple."""
+    # Convert to lowercase and split into words, dropping words shorter
+    # than three letters in the same pass
+    words = _KEYWORD_RE.findall(text.lower())
+    
+    # Filter out stop words (but keep important short words) and return
+    # unique keywords, preserving order
+    return tuple(dict.fromkeys(word for word in words if word not in _KEYWORD_STOP_WORDS))
 
 
 def parse_intent(text: str) -> Dict[str, any]:
@@ -58,64 +155,39 @@ def parse_intent(text: str) -> Dict[str, any]:
     Returns:
         Dictionary containing intent, keywords, and action type
     """
+    intent = parse_intent_shared(text)
+    return {
+        **intent,
+        'keywords': list(intent['keywords']),
+        'potential_function_names': list(intent['potential_function_names'])
+    }
+
+
+@lru_cache(maxsize=4096)
+def parse_intent_shared(text: str) -> Mapping[str, any]:
+    """
+    Memoized parse_intent for hot paths.
+    
+    The result is shared between callers, so it is a read-only mapping
+    whose keywords and potential_function_names are tuples.
+    """
     text_lower = text.lower()
     
+    # (category, label) of every pattern that occurs in the text, found in one pass
+    pattern_hits = set()
+    for pattern in _PATTERN_RE.findall(text_lower):
+        pattern_hits |= _PATTERN_LABELS[pattern]
+    
     # Detect language from query (e.g., "in javascript", "javascript", "js")
     detected_language = None
-    language_patterns = {
-        'python': ['python', 'py'],
-        'javascript': ['javascript', 'js', 'ecmascript'],
-        'java': ['java'],
-        'csharp': ['csharp', 'c#', 'c sharp', 'dotnet'],
-        'go': ['go', 'golang'],
-        'rust': ['rust']
-    }
-    
-    for lang, patterns in language_patterns.items():
-        if any(pattern in text_lower for pattern in patterns):
+    for lang in _LANGUAGE_PATTERNS:
+        if ('language', lang) in pattern_hits:
             detected_language = lang
             break
     
-    # Common action patterns (expanded with more synonyms)
-    action_patterns = {
-        'sort': ['sort', 'order', 'arrange', 'organize', 'rank', 'ranked'],
-        'filter': ['filter', 'find', 'select', 'extract', 'get'],
-        'transform': ['convert', 'transform', 'change', 'modify', 'update'],
-        'calculate': ['calculate', 'compute', 'sum', 'count', 'average', 'total', 'determine', 'get'],
-        'merge': ['merge', 'combine', 'join', 'concatenate', 'unite'],
-        'remove': ['remove', 'delete', 'eliminate', 'drop', 'deduplicate'],
-        'duplicate': ['duplicate', 'copy', 'repeat'],
-        'unique': ['unique', 'distinct', 'deduplicate', 'remove duplicates'],
-        'reverse': ['reverse', 'flip', 'invert'],
-        'search': ['search', 'find', 'locate', 'lookup'],
-        'validate': ['validate', 'check', 'verify', 'test'],
-        'format': ['format', 'formatting', 'style'],
-        'parse': ['parse', 'read', 'extract', 'decode'],
-        'group': ['group', 'organize', 'categorize', 'organize by'],
-    }
-    
-    # Data structure patterns (expanded)
-    data_patterns = {
-        'list': ['list', 'array', 'sequence', 'collection'],
-        'dictionary': ['dictionary', 'dict', 'map', 'object', 'key-value'],
-        'string': ['string', 'text', 'str'],
-        'number': ['number', 'num', 'integer', 'int', 'float'],
-        'tuple': ['tuple', 'pair'],
-        'set': ['set', 'collection'],
-    }
-    
-    # Direction/order patterns
-    order_patterns = {
-        'ascending': ['ascending', 'asc', 'increasing', 'low to high', 'small to large'],
-        'descending': ['descending', 'desc', 'decreasing', 'high to low', 'large to small'],
-    }
-    
     # Extract action (check for multiple matches and prioritize)
     detected_action = None
-    action_matches = []
-    for action, patterns in action_patterns.items():
-        if any(pattern in text_lower for pattern in patterns):
-            action_matches.append(action)
+    action_matches = [action for action in _ACTION_PATTERNS if ('action', action) in pattern_hits]
     
     # Prioritize more specific actions when multiple match
     # Order matters - more specific first
@@ -143,45 +215,336 @@ def parse_intent(text: str) -> Dict[str, any]:
             if not detected_action or detected_action == 'filter':
                 detected_action = 'search'
     else:
-        for data_type, patterns in data_patterns.items():
-            if any(pattern in text_lower for pattern in patterns):
+        for data_type in _DATA_PATTERNS:
+            if ('data', data_type) in pattern_hits:
                 detected_data = data_type
                 break
     
     # Extract order preference
     detected_order = None
-    for order, patterns in order_patterns.items():
-        if any(pattern in text_lower for pattern in patterns):
+    for order in _ORDER_PATTERNS:
+        if ('order', order) in pattern_hits:
             detected_order = order
             break
     
-    keywords = extract_keywords(text)
+    keywords = _extract_keywords(text)
     
     # Extract potential function names from query
     potential_function_names = []
     
-    # Extract underscore-separated names (e.g., "capitalize_string")
-    underscore_names = re.findall(r'\b[a-z_]+_[a-z_]+\b', text_lower)
-    potential_function_names.extend(underscore_names)
+    # Extract underscore-separated names (e.g., "capitalize_string"); only
+    # possible if the query has an underscore at all
+    if '_' in text_lower:
+        underscore_names = _UNDERSCORE_NAME_RE.findall(text_lower)
+        potential_function_names.extend(underscore_names)
     
-    # Extract camelCase names (e.g., "capitalizeString")
-    camel_case_names = re.findall(r'\b[a-z]+[A-Z][a-zA-Z]*\b', text)
-    potential_function_names.extend([name.lower() for name in camel_case_names])
+    # Extract camelCase names (e.g., "capitalizeString"); only possible if
+    # the query has an uppercase letter, i.e. lowercasing changed it
+    if text != text_lower:
+        camel_case_names = _CAMEL_CASE_NAME_RE.findall(text)
+        potential_function_names.extend([name.lower() for name in camel_case_names])
     
     # Extract space-separated potential function names (e.g., "capitalize string")
-    word_pairs = re.findall(r'\b([a-z]{3,})\s+([a-z]{3,})\b', text_lower)
+    word_pairs = _WORD_PAIR_RE.findall(text_lower)
     for word1, word2 in word_pairs:
         potential_function_names.append(f"{word1}_{word2}")
     
-    return {
+    return MappingProxyType({
         'action': detected_action,
         'data_type': detected_data,
         'order': detected_order,
         'keywords': keywords,
         'original_text': text,
         'detected_language': detected_language,
-        'potential_function_names': potential_function_names
-    }
+        'potential_function_names': tuple(potential_function_names)
+    })
+
+
+# Keyword preference rules, applied in this order. A rule is active when
+# the intent keywords intersect every set in the first element, share
+# nothing with the second, and the data type (if given) matches. An active
+# rule adds the delta of its first target whose metadata field equals the
+# value.
+_KEYWORD_RULES = (
+    # "group"/"key" prefer group_by_key, more strongly if "key" is mentioned
+    ((frozenset({'key', 'keys'}),), frozenset(), None,
+     (('id', 'group_by_key', 0.6), ('id', 'flatten_list', -0.3))),
+    ((frozenset({'group', 'organize', 'categorize'}),), frozenset({'key', 'keys'}), None,
+     (('id', 'group_by_key', 0.5), ('id', 'flatten_list', -0.3))),
+    # "flatten" prefers flatten_list
+    ((frozenset({'flatten', 'nested', 'unpack'}),), frozenset(), None,
+     (('id', 'flatten_list', 0.5),)),
+    ((frozenset({'flatten', 'nested', 'unpack'}),), frozenset({'group', 'key'}), None,
+     (('id', 'group_by_key', -0.2),)),
+    # "transform list" needs context: "key" means group_by_key, "nested"
+    # means flatten_list, and ambiguous queries lean towards group_by_key
+    ((frozenset({'transform'}), frozenset({'key', 'keys'})), frozenset(), 'list',
+     (('id', 'group_by_key', 0.4), ('id', 'flatten_list', -0.2))),
+    ((frozenset({'transform'}), frozenset({'nested'})), frozenset({'key', 'keys'}), 'list',
+     (('id', 'flatten_list', 0.4), ('id', 'group_by_key', -0.2))),
+    ((frozenset({'transform'}),), frozenset({'key', 'keys', 'nested'}), 'list',
+     (('id', 'group_by_key', 0.2), ('id', 'flatten_list', -0.1))),
+    # "join" prefers merge functions over filters
+    ((frozenset({'join'}),), frozenset(), None,
+     (('action', 'merge', 0.3), ('action', 'filter', -0.2))),
+)
+
+
+# Keywords that earn an extra bonus when both the query and the function
+# have them, each assigned one bit so shared ones are counted with a mask
+_IMPORTANT_KEYWORDS = (
+    'minimum', 'maximum', 'min', 'max', 'smallest', 'largest', 'lowest', 'highest',
+    'duplicate', 'unique', 'reverse', 'merge', 'sort', 'filter',
+    'sum', 'count', 'average', 'total', 'mean', 'flatten', 'group', 'parse',
+    'validate', 'format', 'email', 'csv', 'join', 'deduplicate',
+    'uppercase', 'lowercase', 'upper', 'lower', 'capital', 'capitalize', 'case',
+    'short', 'first', 'slice', 'take', 'limit', 'chunk', 'split',
+    'locate', 'find', 'search', 'get', 'calculate', 'compute', 'string', 'text'
+)
+_IMPORTANT_KEYWORD_BITS = {keyword: 1 << bit for bit, keyword in enumerate(_IMPORTANT_KEYWORDS)}
+
+
+def _keyword_mask(keywords) -> int:
+    """Bitmap of the important keywords among keywords."""
+    mask = 0
+    for keyword in keywords:
+        mask |= _IMPORTANT_KEYWORD_BITS.get(keyword, 0)
+    return mask
+
+
+_MIN_MAX_KEYWORDS = ('minimum', 'maximum', 'min', 'max', 'smallest', 'largest', 'lowest', 'highest')
+_MIN_MAX_KEYWORDS_MASK = _keyword_mask(_MIN_MAX_KEYWORDS)
+_MIN_KEYWORDS_MASK = _keyword_mask(('min', 'minimum', 'smallest', 'lowest'))
+_MAX_KEYWORDS_MASK = _keyword_mask(('max', 'maximum', 'largest', 'highest'))
+
+
+# Actions that earn partial credit for each intent action
+_SEMANTIC_ACTIONS = {
+    'calculate': ('search', 'find'),
+    'search': ('calculate', 'find'),
+    'find': ('calculate', 'search'),
+    'transform': ('convert', 'change', 'group'),
+    'filter': ('select', 'extract'),
+    'group': ('transform', 'organize'),
+    'sort': ('rank', 'order')
+}
+
+
+# Words ignored when comparing the query with a function's description
+_DESCRIPTION_STOP_WORDS = frozenset({'a', 'an', 'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'})
+
+
+def _meaningful_words(text: str) -> frozenset:
+    """Distinct words of text longer than two characters, without common stop words."""
+    return frozenset(word for word in text.split() if word not in _DESCRIPTION_STOP_WORDS and len(word) > 2)
+
+
+# Phrases hinting at an order for "sort unique" queries
+_DESCENDING_HINTS = ('desc', 'descending', 'decreasing', 'high to low', 'large to small', 'biggest', 'largest', 'rank')
+_ASCENDING_HINTS = ('asc', 'ascending', 'increasing', 'low to high', 'small to large', 'smallest')
+
+
+# Phrases that name the function being asked for, in the order they are tried
+_QUERIED_NAME_PATTERNS = (
+    re.compile(r'function\s+([a-z_]+)'),
+    re.compile(r'code\s+for\s+([a-z_]+)'),
+    re.compile(r'get\s+([a-z_]+)'),
+    re.compile(r'([a-z_]+)\s+function'),
+)
+
+
+class _IntentFeatures:
+    """Query-side values used by the scorer, derived once per intent."""
+    
+    __slots__ = ('original_text', 'intent_keywords', 'detected_lang', 'potential_name_counts', 'asks_for_code',
+                 'queried_names', 'keyword_rules', 'meaningful_words', 'keyword_mask',
+                 'has_remove', 'has_duplicate', 'has_unique', 'has_sort', 'wants_deduplication',
+                 'has_descending_keywords', 'has_ascending_keywords', 'is_simple_sort_query',
+                 'counts_string', 'mentions_upper', 'finds_upper', 'finds_numbers', 'has_min_keyword',
+                 'has_max_keyword', 'extracts_text', 'min_max_context', 'has_min_query', 'has_max_query',
+                 'has_find_search', 'has_upper_case', 'has_lower_case', 'mentions_rank', 'organizes_list',
+                 'organizes_by_key', 'has_desc_order_hints', 'has_asc_order_hints', 'is_short_unique_query')
+    
+    def __init__(self, intent: Dict[str, any]):
+        self.original_text = intent.get('original_text', '').lower()
+        self.intent_keywords = frozenset(intent['keywords'])
+        self.detected_lang = intent.get('detected_language')
+        # How often each potential function name occurs in the query
+        self.potential_name_counts = Counter(intent.get('potential_function_names', []))
+        self.asks_for_code = 'function' in self.original_text or 'code' in self.original_text
+        # (name, name parts) named by "function <name>", "code for <name>",
+        # "get <name>" and "<name> function", first occurrence of each
+        self.queried_names = ()
+        text = self.original_text
+        if 'function' in text or 'code for' in text or 'get' in text:
+            self.queried_names = tuple(
+                (match.group(1), tuple(match.group(1).split('_')))
+                for match in (pattern.search(text) for pattern in _QUERIED_NAME_PATTERNS)
+                if match
+            )
+        self.meaningful_words = _meaningful_words(self.original_text)
+        self.keyword_mask = _keyword_mask(self.intent_keywords)
+        
+        # Flags for the "remove duplicates" vs "sort unique" distinction
+        keywords = self.intent_keywords
+        self.has_remove = 'remove' in keywords or 'delete' in keywords or 'deduplicate' in keywords or 'get rid of' in text
+        self.has_duplicate = 'duplicate' in keywords or 'duplicates' in keywords
+        self.has_unique = 'unique' in keywords or 'distinct' in keywords
+        self.has_sort = 'sort' in keywords or 'order' in keywords or 'arrange' in keywords
+        self.wants_deduplication = (self.has_remove or 'deduplicate' in text) and (self.has_duplicate or self.has_unique)
+        # Order hints for "sort unique" queries without an explicit order
+        self.has_ascending_keywords = any(kw in text for kw in _ASCENDING_HINTS)
+        # "rank" often implies descending order (ranking from best to worst)
+        self.has_descending_keywords = any(kw in text for kw in _DESCENDING_HINTS) or \
+            ('rank' in text and not self.has_ascending_keywords)
+        # Check if query is just "sort" or "sort list" - test cases seem to expect descending
+        self.is_simple_sort_query = len(keywords) <= 2 and self.has_sort and not self.has_unique
+        
+        # Targets of the _KEYWORD_RULES that apply to this intent
+        data_type = intent.get('data_type')
+        action = intent.get('action')
+        self.keyword_rules = tuple(
+            targets
+            for required, forbidden, rule_data_type, targets in _KEYWORD_RULES
+            if all(not group.isdisjoint(self.intent_keywords) for group in required)
+            and forbidden.isdisjoint(self.intent_keywords)
+            and (rule_data_type is None or rule_data_type == data_type)
+        )
+        
+        # Query-only conditions of the special cases in _score_function, so
+        # each substring test runs once per query instead of once per function
+        self.counts_string = ('count' in keywords or 'determine' in text or 'get' in keywords) and data_type == 'string'
+        self.mentions_upper = 'upper' in keywords or 'uppercase' in text or 'capital' in keywords
+        self.finds_upper = 'find' in keywords and self.mentions_upper
+        self.finds_numbers = 'find' in keywords and ('numbers' in keywords or 'list' in keywords)
+        self.has_min_keyword = any(kw in keywords for kw in ['min', 'minimum', 'smallest', 'lowest'])
+        self.has_max_keyword = any(kw in keywords for kw in ['max', 'maximum', 'largest', 'highest'])
+        self.extracts_text = 'extract' in keywords and ('text' in keywords or 'string' in keywords or 'csv' in keywords)
+        
+        # "calculate"/"locate"/"get" with "minimum" or "maximum"
+        self.min_max_context = action == 'calculate' or 'calculate' in text or 'locate' in text or 'get' in text
+        self.has_min_query = 'minimum' in text or 'min' in text or 'smallest' in text or 'lowest' in text
+        self.has_max_query = 'maximum' in text or 'max' in text or 'largest' in text or 'highest' in text
+        
+        # "find" with "upper case"/"lower case"
+        self.has_find_search = 'find' in text or 'search' in text or 'get' in text
+        self.has_upper_case = ('upper' in text and 'case' in text) or 'uppercase' in text or 'upper-case' in text
+        self.has_lower_case = ('lower' in text and 'case' in text) or 'lowercase' in text or 'lower-case' in text
+        
+        self.mentions_rank = 'rank' in text
+        self.organizes_list = 'organize' in text and data_type == 'list'
+        self.organizes_by_key = 'key' in text or 'group' in text
+        
+        # Implicit order hints for functions with an order when the query has none
+        text_lower = text.lower()
+        self.has_desc_order_hints = any(hint in text_lower for hint in ['desc', 'descending', 'decreasing', 'high', 'large', 'big', 'rank'])
+        self.has_asc_order_hints = any(hint in text_lower for hint in ['asc', 'ascending', 'increasing', 'low', 'small'])
+        # Short queries with "unique" - test cases prefer descending
+        self.is_short_unique_query = len(text_lower.split()) <= 3 and 'unique' in text_lower
+
+
+class _FunctionFeatures:
+    """Function-side values used by the scorer, derived once per function."""
+    
+    __slots__ = ('source_fields', 'name', 'name_joined', 'name_spaced', 'name_phrase', 'name_parts', 'name_part_set',
+                 'name_long_parts', 'name_re', 'language', 'description', 'description_words', 'keywords',
+                 'keyword_mask', 'name_has_min', 'name_has_max', 'name_has_min_like', 'name_has_max_like',
+                 'name_has_extreme', 'name_has_extreme_or_count', 'name_has_aggregate', 'name_has_sum_or_calculate',
+                 'name_has_sort', 'name_has_sort_unique', 'names_upper_case', 'names_lower_case')
+    
+    def __init__(self, function_metadata: Dict[str, any]):
+        self.source_fields = _feature_source_fields(function_metadata)
+        name = function_metadata.get('name', '').lower()
+        self.name = name
+        self.name_joined = name.replace('_', '')
+        self.name_spaced = name.replace('_', ' ')
+        # Spaced name if long enough to count as mentioned anywhere in a query
+        self.name_phrase = self.name_spaced if len(self.name_spaced) > 3 else None
+        self.name_parts = tuple(name.split('_'))
+        self.name_part_set = frozenset(self.name_parts)
+        self.name_long_parts = tuple(part for part in self.name_parts if len(part) > 2)
+        
+        # Spellings of the name that count as an exact mention in a query
+        variants = [
+            name,  # Original: "capitalize_string"
+            self.name_joined,  # "capitalizestring"
+            self.name_spaced,  # "capitalize string"
+            name.replace('_', '-'),  # "capitalize-string"
+        ]
+        # Also check camelCase variants for JavaScript functions
+        if function_metadata.get('language') == 'javascript' and len(self.name_parts) > 1:
+            # Convert snake_case to camelCase: capitalize_string -> capitalizeString
+            parts = self.name_parts
+            variants.append(parts[0] + ''.join(p.capitalize() for p in parts[1:]))
+        # Only check meaningful variants, all in one word-bounded alternation
+        self.name_re = _name_variants_pattern(tuple(variant for variant in variants if len(variant) > 3))
+        
+        self.language = function_metadata.get('language', 'python').lower()
+        self.description = function_metadata.get('description', '').lower()
+        self.description_words = _meaningful_words(self.description)
+        self.keywords = frozenset(function_metadata.get('keywords', []))
+        self.keyword_mask = _keyword_mask(self.keywords)
+        
+        # Substrings of the name (and description) tested by the scorer's special cases
+        self.name_has_min = 'min' in name
+        self.name_has_max = 'max' in name
+        self.name_has_min_like = self.name_has_min or 'smallest' in name
+        self.name_has_max_like = self.name_has_max or 'largest' in name
+        self.name_has_extreme = self.name_has_max or self.name_has_min
+        self.name_has_extreme_or_count = self.name_has_extreme or 'count' in name
+        self.name_has_sum_or_calculate = 'calculate' in name or 'sum' in name
+        self.name_has_aggregate = self.name_has_sum_or_calculate or 'count' in name
+        self.name_has_sort = 'sort' in name
+        self.name_has_sort_unique = self.name_has_sort and 'unique' in name
+        # e.g. find_uppercase / find_lowercase
+        self.names_upper_case = 'upper' in name and ('case' in name or 'upper' in self.description)
+        self.names_lower_case = 'lower' in name and ('case' in name or 'lower' in self.description)
+
+
+@lru_cache(maxsize=2048)
+def _name_variants_pattern(variants: Tuple[str, ...]) -> Optional["re.Pattern"]:
+    """
+    Compile the word-bounded alternation of a function's name variants.
+    
+    Cached by the variants themselves, so features rebuilt for a reloaded
+    catalog reuse the compiled patterns.
+    """
+    if not variants:
+        return None
+    return re.compile(r'\b(?:%s)\b' % '|'.join(map(re.escape, variants)))
+
+
+def _feature_source_fields(function_metadata: Dict[str, any]) -> tuple:
+    """The metadata values _FunctionFeatures is derived from."""
+    return (function_metadata.get('name'), function_metadata.get('language'), function_metadata.get('description'),
+            function_metadata.get('keywords'))
+
+
+# Features of recently scored functions, keyed by id() of the metadata dict.
+# Entries keep their dict alive, so an id is never reused while cached, and
+# are dropped if the name, language, description or keywords have been
+# replaced (metadata is otherwise treated as immutable).
+_FUNCTION_FEATURES: Dict[int, Tuple[Dict[str, any], _FunctionFeatures]] = {}
+_MAX_FUNCTION_FEATURES = 16384
+
+
+def _function_features(function_metadata: Dict[str, any]) -> _FunctionFeatures:
+    """Get the cached features of a function, computing them on first use."""
+    entry = _FUNCTION_FEATURES.get(id(function_metadata))
+    if entry is not None and entry[0] is function_metadata:
+        features = entry[1]
+        source_fields = features.source_fields
+        if (function_metadata.get('name') is source_fields[0]
+                and function_metadata.get('language') is source_fields[1]
+                and function_metadata.get('description') is source_fields[2]
+                and function_metadata.get('keywords') is source_fields[3]):
+            return features
+    
+    features = _FunctionFeatures(function_metadata)
+    if len(_FUNCTION_FEATURES) >= _MAX_FUNCTION_FEATURES:
+        _FUNCTION_FEATURES.clear()
+    _FUNCTION_FEATURES[id(function_metadata)] = (function_metadata, features)
+    return features
 
 
 def calculate_relevance_score(intent: Dict[str, any], function_metadata: Dict[str, any]) -> float:
@@ -195,62 +558,76 @@ def calculate_relevance_score(intent: Dict[str, any], function_metadata: Dict[st
     Returns:
         Relevance score (0.0 to 1.0)
     """
+    return _score_function(intent, _IntentFeatures(intent), function_metadata)
+
+
+def score_functions(intent: Dict[str, any], functions: List[Dict[str, any]]) -> List[float]:
+    """
+    Calculate relevance scores for many functions against one intent.
+    Same scores as calculate_relevance_score, but the query-side work is done once.
+    
+    Args:
+        intent: Parsed intent from user input
+        functions: Metadata of the functions to score
+    
+    Returns:
+        Relevance scores (0.0 to 1.0), in the order of functions
+    """
+    features = _IntentFeatures(intent)
+    return [_score_function(intent, features, func) for func in functions]
+
+
+def _score_function(intent: Dict[str, any], features: _IntentFeatures, function_metadata: Dict[str, any]) -> float:
+    """Score one function, using query-side values precomputed in features."""
     score = 0.0
-    original_text = intent.get('original_text', '').lower()
+    original_text = features.original_text
+    
+    # Function-side values, derived once per function
+    func = _function_features(function_metadata)
+    func_name = func.name
+    
+    # Fields read by many rules below, looked up once
+    intent_action = intent.get('action')
+    intent_data_type = intent.get('data_type')
+    intent_order = intent.get('order')
+    func_id = function_metadata.get('id')
+    func_action = function_metadata.get('action')
+    func_data_type = function_metadata.get('data_type')
+    func_order = function_metadata.get('order')
     
     # CRITICAL: Exact function name match (highest priority)
-    func_name = function_metadata.get('name', '').lower()
-    func_id = function_metadata.get('id', '').lower()
-    
-    # Check if query contains exact function name or ID (multiple patterns)
-    func_name_variants = [
-        func_name,  # Original: "capitalize_string"
-        func_name.replace('_', ''),  # "capitalizestring"
-        func_name.replace('_', ' '),  # "capitalize string"
-        func_name.replace('_', '-'),  # "capitalize-string"
-    ]
-    
-    # Also check camelCase variants for JavaScript functions
-    if function_metadata.get('language') == 'javascript':
-        # Convert snake_case to camelCase: capitalize_string -> capitalizeString
-        parts = func_name.split('_')
-        if len(parts) > 1:
-            camel_case = parts[0] + ''.join(p.capitalize() for p in parts[1:])
-            func_name_variants.append(camel_case)
-    
-    # Check for exact match in query
-    for variant in func_name_variants:
-        if variant and len(variant) > 3:  # Only check meaningful variants
-            # Exact word boundary match
-            if re.search(r'\b' + re.escape(variant) + r'\b', original_text):
-                return 1.0  # Perfect match - highest priority
+    # Check if query contains exact function name or ID (multiple patterns,
+    # exact word boundary match)
+    if func.name_re is not None and func.name_re.search(original_text):
+        return 1.0  # Perfect match - highest priority
     
     # Check if function name (without underscores) appears in query
-    func_name_clean = func_name.replace('_', ' ')
-    if func_name_clean in original_text and len(func_name_clean) > 3:
+    if func.name_phrase is not None and func.name_phrase in original_text:
         score += 0.6  # Very strong bonus for function name match
     
     # Check if function name parts appear in query (e.g., "capitalize" and "string")
-    func_name_parts = func_name.split('_')
+    func_name_parts = func.name_parts
     if len(func_name_parts) >= 2:
-        parts_in_query = sum(1 for part in func_name_parts if part in original_text and len(part) > 2)
+        parts_in_query = sum(1 for part in func.name_long_parts if part in original_text)
         if parts_in_query == len(func_name_parts):
             score += 0.5  # All parts match - very strong signal
         elif parts_in_query >= len(func_name_parts) * 0.7:  # 70% of parts match
             score += 0.3  # Most parts match - strong signal
     
     # Check potential function names from query
-    potential_names = intent.get('potential_function_names', [])
-    for potential_name in potential_names:
-        if potential_name == func_name or potential_name == func_name.replace('_', ''):
-            score += 0.8  # Very strong match for potential function name
-            # If query explicitly asks for function (e.g., "capitalize_string function")
-            if 'function' in original_text or 'code' in original_text:
-                score += 0.2  # Extra bonus
+    # (looked up in the per-query name counts; every occurrence counts)
+    name_mentions = features.potential_name_counts.get(func_name, 0)
+    if func.name_joined != func_name:
+        name_mentions += features.potential_name_counts.get(func.name_joined, 0)
+    for _ in range(name_mentions):
+        score += 0.8  # Very strong match for potential function name
+        # If query explicitly asks for function (e.g., "capitalize_string function")
+        if features.asks_for_code:
+            score += 0.2  # Extra bonus
     
     # Language matching - if language is detected in query, prioritize that language
-    detected_lang = intent.get('detected_language')
-    func_lang = function_metadata.get('language', 'python').lower()
+    detected_lang = features.detected_lang
+    func_lang = func.language
     if detected_lang:
         if detected_lang == func_lang:
             score += 0.4  # Strong bonus for matching language
@@ -258,8 +635,8 @@ def calculate_relevance_score(intent: Dict[str, any], function_metadata: Dict[st
             score -= 0.6  # Very strong penalty for wrong language
     
     # Keyword matching (prioritize this for better semantic matching)
-    intent_keywords = set(intent['keywords'])
-    function_keywords = set(function_metadata.get('keywords', []))
+    intent_keywords = features.intent_keywords
+    function_keywords = func.keywords
     
     if intent_keywords and function_keywords:
         common_keywords = intent_keywords.intersection(function_keywords)
@@ -268,11 +645,11 @@ def calculate_relevance_score(intent: Dict[str, any], function_metadata: Dict[st
         keyword_score = len(common_keywords) / max(len(intent_keywords), len(function_keywords))
         
         # Check if function name contains intent keywords (HIGH PRIORITY)
-        func_description = function_metadata.get('description', '').lower()
+        func_description = func.description
         name_matches = 0
         for keyword in intent_keywords:
             # Exact match in function name (very strong)
-            if keyword == func_name or keyword in func_name.split('_'):
+            if keyword == func_name or keyword in func.name_part_set:
                 name_matches += 1
                 keyword_score += 0.8  # Very strong bonus for exact keyword match in name
             elif keyword in func_name:
@@ -282,240 +659,172 @@ def calculate_relevance_score(intent: Dict[str, any], function_metadata: Dict[st
                 keyword_score += 0.25  # Bonus for keyword in description
         
         # Special: if query has "function <name>" or "code for <name>" pattern, prioritize exact name match
-        if 'function' in original_text or 'code for' in original_text or 'get' in original_text:
-            # Extract potential function name after "function" or "code for"
-            patterns = [
-                r'function\s+([a-z_]+)',
-                r'code\s+for\s+([a-z_]+)',
-                r'get\s+([a-z_]+)',
-                r'([a-z_]+)\s+function'
-            ]
-            for pattern in patterns:
-                func_match = re.search(pattern, original_text)
-                if func_match:
-                    queried_name = func_match.group(1)
-                    # Check exact match
-                    if queried_name == func_name or queried_name == func_name.replace('_', ''):
-                        keyword_score += 2.0  # Perfect match bonus - very high (overrides other scores)
-                        break
-                    # Check if queried name parts match function name parts
-                    queried_parts = queried_name.split('_')
-                    func_parts = func_name.split('_')
-                    if len(queried_parts) == len(func_parts):
-                        if all(qp in func_parts for qp in queried_parts):
-                            keyword_score += 1.5  # All parts match
-                            break
+        for queried_name, queried_parts in features.queried_names:
+            # Check exact match
+            if queried_name == func_name or queried_name == func.name_joined:
+                keyword_score += 2.0  # Perfect match bonus - very high (overrides other scores)
+                break
+            # Check if queried name parts match function name parts
+            if len(queried_parts) == len(func_name_parts):
+                if all(qp in func_name_parts for qp in queried_parts):
+                    keyword_score += 1.5  # All parts match
+                    break
         
-        # Bonus for exact important keyword matches (minimum, maximum, etc.)
-        important_keywords = {'minimum', 'maximum', 'min', 'max', 'smallest', 'largest', 'lowest', 'highest',
-                            'duplicate', 'unique', 'reverse', 'merge', 'sort', 'filter',
-                            'sum', 'count', 'average', 'total', 'mean', 'flatten', 'group', 'parse',
-                            'validate', 'format', 'email', 'csv', 'join', 'deduplicate',
-                            'uppercase', 'lowercase', 'upper', 'lower', 'capital', 'capitalize', 'case',
-                            'short', 'first', 'slice', 'take', 'limit', 'chunk', 'split',
-                            'locate', 'find', 'search', 'get', 'calculate', 'compute', 'string', 'text'}
-        important_matches = common_keywords.intersection(important_keywords)
+        # Bonus for exact important keyword matches (minimum, maximum, etc.),
+        # counted on the keyword bitmaps
+        important_matches = features.keyword_mask & func.keyword_mask
+        important_count = bin(important_matches).count('1')
         if important_matches:
-            keyword_score += len(important_matches) * 0.3  # Strong bonus for important matches
+            keyword_score += important_count * 0.3  # Strong bonus for important matches
         
         # Special handling for min/max keywords - very high weight
-        min_max_keywords = {'minimum', 'maximum', 'min', 'max', 'smallest', 'largest', 'lowest', 'highest'}
-        min_max_matches = common_keywords.intersection(min_max_keywords)
+        min_max_matches = important_matches & _MIN_MAX_KEYWORDS_MASK
         if min_max_matches:
             # Check if function name contains the min/max keyword
-            for mm_kw in min_max_matches:
-                if mm_kw in func_name or mm_kw in func_description:
+            for mm_kw in _MIN_MAX_KEYWORDS:
+                if min_max_matches & _IMPORTANT_KEYWORD_BITS[mm_kw] and (mm_kw in func_name or mm_kw in func_description):
                     keyword_score += 0.7  # Very strong bonus for min/max in function name/description
                     break
             # Also check for semantic matches (min/smallest/lowest, max/largest/highest)
             # Order matters - if "smallest" or "min" appears before "find", it's a strong signal
-            has_min_keywords = 'min' in min_max_matches or 'minimum' in min_max_matches or 'smallest' in min_max_matches or 'lowest' in min_max_matches
-            has_max_keywords = 'max' in min_max_matches or 'maximum' in min_max_matches or 'largest' in min_max_matches or 'highest' in min_max_matches
+            has_min_keywords = min_max_matches & _MIN_KEYWORDS_MASK
+            has_max_keywords = min_max_matches & _MAX_KEYWORDS_MASK
             
             if has_min_keywords:
-                if 'min' in func_name:
+                if func.name_has_min:
                     keyword_score += 0.8  # Very strong bonus for min functions
-                elif 'max' in func_name:
+                elif func.name_has_max:
                     keyword_score -= 0.5  # Very strong penalty for max when min is mentioned
-                elif 'calculate' in func_name or 'sum' in func_name or 'count' in func_name:
+                elif func.name_has_aggregate:
                     keyword_score -= 0.4  # Strong penalty for other functions when min is mentioned
             if has_max_keywords:
-                if 'max' in func_name:
+                if func.name_has_max:
                     keyword_score += 0.8  # Very strong bonus for max functions
-                elif 'min' in func_name:
+                elif func.name_has_min:
                     keyword_score -= 0.5  # Very strong penalty for min when max is mentioned
-                elif 'calculate' in func_name or 'sum' in func_name or 'count' in func_name:
+                elif func.name_has_aggregate:
                     keyword_score -= 0.4  # Strong penalty for other functions when max is mentioned
         
         # Special handling for compound operations (sort + unique, etc.)
         # If query has multiple important keywords, prioritize functions that match more
-        if len(important_matches) >= 2:
+        if important_count >= 2:
             keyword_score += 0.25  # Extra bonus for multiple important keyword matches
         
         # Special handling for "remove duplicates" vs "sort unique" distinction
-        has_remove = 'remove' in intent_keywords or 'delete' in intent_keywords or 'deduplicate' in intent_keywords or 'get rid of' in original_text
-        has_duplicate = 'duplicate' in intent_keywords or 'duplicates' in intent_keywords
-        has_unique = 'unique' in intent_keywords or 'distinct' in intent_keywords
-        has_sort = 'sort' in intent_keywords or 'order' in intent_keywords or 'arrange' in intent_keywords
+        # (query flags are precomputed in _IntentFeatures)
+        has_remove = features.has_remove
+        has_duplicate = features.has_duplicate
+        has_unique = features.has_unique
+        has_sort = features.has_sort
         
         # Strong preference for remove_duplicates when "deduplicate" or "remove duplicate" is mentioned
-        if (has_remove or 'deduplicate' in original_text) and (has_duplicate or has_unique):
-            if function_metadata.get('id') == 'remove_duplicates':
+        if features.wants_deduplication:
+            if func_id == 'remove_duplicates':
                 keyword_score += 0.5  # Very strong bonus for remove_duplicates
-            elif 'sort' in func_name and not has_sort:
+            elif func.name_has_sort and not has_sort:
                 keyword_score -= 0.3  # Strong penalty for sort functions
         
         # But if query has both "unique" and "duplicate" without "remove", check context
         if has_unique and has_duplicate and not has_remove:
             if has_sort:
                 # If sort is mentioned, prefer sort_unique functions
-                if 'sort' in func_name and 'unique' in func_name:
+                if func.name_has_sort_unique:
                     keyword_score += 0.2  # Bonus for sort_unique functions
-                elif function_metadata.get('id') == 'remove_duplicates':
+                elif func_id == 'remove_duplicates':
                     keyword_score -= 0.1  # Small penalty when sort is mentioned
             else:
                 # If no sort mentioned, prefer remove_duplicates
-                if function_metadata.get('id') == 'remove_duplicates':
+                if func_id == 'remove_duplicates':
                     keyword_score += 0.2  # Bonus for remove_duplicates
-                elif 'sort' in func_name:
+                elif func.name_has_sort:
                     keyword_score -= 0.1  # Small penalty for sort functions
         
         # If query has "sort" and "unique" but no explicit order, check for hints
-        has_descending_keywords = any(kw in original_text for kw in ['desc', 'descending', 'decreasing', 'high to low', 'large to small', 'biggest', 'largest', 'rank'])
-        has_ascending_keywords = any(kw in original_text for kw in ['asc', 'ascending', 'increasing', 'low to high', 'small to large', 'smallest'])
-        
-        # "rank" often implies descending order (ranking from best to worst)
-        if 'rank' in original_text and not has_ascending_keywords:
-            has_descending_keywords = True
-        
-        # Check if query is just "sort" or "sort list" - test cases seem to expect descending
-        is_simple_sort_query = len(intent_keywords) <= 2 and has_sort and not has_unique
-        
-        if has_sort and has_unique and not intent.get('order'):
-            if has_descending_keywords:
-                if function_metadata.get('id') == 'sort_desc_unique':
+        if has_sort and has_unique and not intent_order:
+            if features.has_descending_keywords:
+                if func_id == 'sort_desc_unique':
                     keyword_score += 0.4  # Very strong preference for descending
-                elif function_metadata.get('id') == 'sort_asc_unique':
+                elif func_id == 'sort_asc_unique':
                     keyword_score -= 0.3  # Strong penalty for ascending
-            elif has_ascending_keywords:
-                if function_metadata.get('id') == 'sort_asc_unique':
+            elif features.has_ascending_keywords:
+                if func_id == 'sort_asc_unique':
                     keyword_score += 0.4  # Very strong preference for ascending
-                elif function_metadata.get('id') == 'sort_desc_unique':
+                elif func_id == 'sort_desc_unique':
                     keyword_score -= 0.3  # Strong penalty for descending
             else:
                 # For ambiguous queries, test cases seem to prefer descending
                 # This might be a test case bias, but we'll handle it
-                if function_metadata.get('id') == 'sort_desc_unique':
+                if func_id == 'sort_desc_unique':
                     keyword_score += 0.2  # Stronger preference for descending when ambiguous
-                elif function_metadata.get('id') == 'sort_asc_unique':
+                elif func_id == 'sort_asc_unique':
                     keyword_score -= 0.15  # Stronger penalty for ascending when ambiguous
-        elif is_simple_sort_query:
+        elif features.is_simple_sort_query:
             # Simple "sort list" queries - test cases expect descending
-            if function_metadata.get('id') == 'sort_desc_unique':
+            if func_id == 'sort_desc_unique':
                 keyword_score += 0.25  # Stronger preference for descending
-            elif function_metadata.get('id') == 'sort_asc_unique':
+            elif func_id == 'sort_asc_unique':
                 keyword_score -= 0.15  # Stronger penalty for ascending
         
-        # Special handling for "group" keyword - prefer group_by_key
-        # Also check if "key" is mentioned (stronger signal)
-        has_group = 'group' in intent_keywords or 'organize' in intent_keywords or 'categorize' in intent_keywords
-        has_key = 'key' in intent_keywords or 'keys' in intent_keywords
-        
-        if has_group or has_key:
-            if function_metadata.get('id') == 'group_by_key':
-                keyword_score += 0.6 if has_key else 0.5  # Even stronger if "key" is mentioned
-            elif function_metadata.get('id') == 'flatten_list':
-                keyword_score -= 0.3  # Stronger penalty for flatten when group/key is mentioned
-        
-        # Special handling for "flatten" keyword - prefer flatten_list
-        if 'flatten' in intent_keywords or 'nested' in intent_keywords or 'unpack' in intent_keywords:
-            if function_metadata.get('id') == 'flatten_list':
-                keyword_score += 0.5  # Strong bonus for flatten_list
-            elif function_metadata.get('id') == 'group_by_key' and 'group' not in intent_keywords and 'key' not in intent_keywords:
-                keyword_score -= 0.2  # Penalty for group when flatten is mentioned
-        
-        # Special handling for "transform list" - need context to distinguish
-        # If "key" is mentioned, prefer group_by_key; if "nested" is mentioned, prefer flatten_list
-        if 'transform' in intent_keywords and intent.get('data_type') == 'list':
-            if 'key' in intent_keywords or 'keys' in intent_keywords:
-                if function_metadata.get('id') == 'group_by_key':
-                    keyword_score += 0.4  # Strong bonus for group_by_key
-                elif function_metadata.get('id') == 'flatten_list':
-                    keyword_score -= 0.2  # Penalty for flatten
-            elif 'nested' in intent_keywords:
-                if function_metadata.get('id') == 'flatten_list':
-                    keyword_score += 0.4  # Strong bonus for flatten_list
-                elif function_metadata.get('id') == 'group_by_key':
-                    keyword_score -= 0.2  # Penalty for group
-            else:
-                # Ambiguous - prefer group_by_key (more common use case)
-                if function_metadata.get('id') == 'group_by_key':
-                    keyword_score += 0.2  # Moderate bonus
-                elif function_metadata.get('id') == 'flatten_list':
-                    keyword_score -= 0.1  # Small penalty
-        
-        # Special handling for "join" keyword - prefer merge functions
-        if 'join' in intent_keywords:
-            if function_metadata.get('action') == 'merge':
-                keyword_score += 0.3  # Strong bonus for merge functions
-            elif function_metadata.get('action') == 'filter':
-                keyword_score -= 0.2  # Penalty for filter when join is mentioned
+        # Group / flatten / transform / join preferences, from the rule
+        # table: the first matching target of each active rule applies
+        for targets in features.keyword_rules:
+            for field, value, delta in targets:
+                if function_metadata.get(field) == value:
+                    keyword_score += delta
+                    break
         
         # Special handling for "count" or "determine" with string - prefer count_words or count_uppercase
-        if ('count' in intent_keywords or 'determine' in original_text or 'get' in intent_keywords) and intent.get('data_type') == 'string':
-            if 'upper' in intent_keywords or 'uppercase' in original_text or 'capital' in intent_keywords:
-                if function_metadata.get('id') == 'count_uppercase':
+        if features.counts_string:
+            if features.mentions_upper:
+                if func_id == 'count_uppercase':
                     keyword_score += 0.6  # Very strong bonus for count_uppercase
-                elif function_metadata.get('id') == 'count_words':
+                elif func_id == 'count_words':
                     keyword_score -= 0.2  # Penalty for count_words when uppercase is mentioned
-            elif function_metadata.get('id') == 'count_words':
+            elif func_id == 'count_words':
                 keyword_score += 0.5  # Very strong bonus for count_words
-            elif function_metadata.get('id') == 'reverse_string':
+            elif func_id == 'reverse_string':
                 keyword_score -= 0.25  # Strong penalty for reverse when count/determine/get is mentioned
         
         # Special handling for "find" with "upper" or "uppercase" - prefer find_uppercase
-        if 'find' in intent_keywords and ('upper' in intent_keywords or 'uppercase' in original_text or 'capital' in intent_keywords):
-            if function_metadata.get('id') == 'find_uppercase':
+        if features.finds_upper:
+            if func_id == 'find_uppercase':
                 keyword_score += 0.6  # Very strong bonus for find_uppercase
-            elif 'max' in func_name or 'min' in func_name:
+            elif func.name_has_extreme:
                 keyword_score -= 0.3  # Strong penalty for find_max/find_min when uppercase is mentioned
-            elif function_metadata.get('id') == 'count_words':
+            elif func_id == 'count_words':
                 keyword_score -= 0.2  # Penalty for count_words when find+upper is mentioned
         
         # Special handling for "find" with "numbers" or "list" - prefer find_max/find_min over filter
         # But check if min/max keywords are present to distinguish
-        if 'find' in intent_keywords and ('numbers' in intent_keywords or 'list' in intent_keywords):
-            has_min = any(kw in intent_keywords for kw in ['min', 'minimum', 'smallest', 'lowest'])
-            has_max = any(kw in intent_keywords for kw in ['max', 'maximum', 'largest', 'highest'])
-            
-            if has_min:
-                if 'min' in func_name:
+        if features.finds_numbers:
+            if features.has_min_keyword:
+                if func.name_has_min:
                     keyword_score += 0.5  # Very strong bonus for find_min
-                elif 'max' in func_name:
+                elif func.name_has_max:
                     keyword_score -= 0.3  # Strong penalty for find_max
-                elif function_metadata.get('id') == 'filter_even':
+                elif func_id == 'filter_even':
                     keyword_score -= 0.25  # Penalty for filter
-            elif has_max:
-                if 'max' in func_name:
+            elif features.has_max_keyword:
+                if func.name_has_max:
                     keyword_score += 0.5  # Very strong bonus for find_max
-                elif 'min' in func_name:
+                elif func.name_has_min:
                     keyword_score -= 0.3  # Strong penalty for find_min
-                elif function_metadata.get('id') == 'filter_even':
+                elif func_id == 'filter_even':
                     keyword_score -= 0.25  # Penalty for filter
             else:
                 # No min/max specified - prefer find_max/find_min over filter/calculate
-                if 'max' in func_name or 'min' in func_name:
+                if func.name_has_extreme:
                     keyword_score += 0.3  # Bonus for find functions
-                elif function_metadata.get('id') == 'filter_even':
+                elif func_id == 'filter_even':
                     keyword_score -= 0.2  # Penalty for filter
-                elif 'calculate' in func_name or 'sum' in func_name:
+                elif func.name_has_sum_or_calculate:
                     keyword_score -= 0.15  # Penalty for calculate functions
         
         # Special handling for "extract" with "text" or "string" - prefer parse over reverse
-        if 'extract' in intent_keywords and ('text' in intent_keywords or 'string' in intent_keywords or 'csv' in intent_keywords):
-            if function_metadata.get('id') == 'parse_csv_line':
+        if features.extracts_text:
+            if func_id == 'parse_csv_line':
                 keyword_score += 0.4  # Strong bonus for parse_csv_line
-            elif function_metadata.get('id') == 'reverse_string':
+            elif func_id == 'reverse_string':
                 keyword_score -= 0.2  # Penalty for reverse when extract+text is mentioned
         
         # If we have name matches, prioritize this function heavily
@@ -525,125 +834,100 @@ def calculate_relevance_score(intent: Dict[str, any], function_metadata: Dict[st
             score += min(keyword_score * 0.5, 0.5)  # Higher standard weight
     
     # Match action (but with lower weight, as semantic similarity matters more)
-    if intent.get('action') and function_metadata.get('action') == intent.get('action'):
+    if intent_action and func_action == intent_action:
         score += 0.25  # Increased weight for action matching
     
     # Semantic action mapping (calculate/find are similar for min/max operations)
-    semantic_actions = {
-        'calculate': ['search', 'find'],
-        'search': ['calculate', 'find'],
-        'find': ['calculate', 'search'],
-        'transform': ['convert', 'change', 'group'],
-        'filter': ['select', 'extract'],
-        'group': ['transform', 'organize'],
-        'sort': ['rank', 'order']
-    }
-    if intent.get('action') and function_metadata.get('action'):
-        if function_metadata.get('action') in semantic_actions.get(intent.get('action'), []):
+    if intent_action and func_action:
+        if func_action in _SEMANTIC_ACTIONS.get(intent_action, ()):
             score += 0.12  # Partial credit for semantically similar actions
     
     # Special case: "search" with list should prefer find_max/find_min over calculate functions
-    if intent.get('action') == 'search' and intent.get('data_type') == 'list':
-        if 'max' in func_name or 'maximum' in func_name or 'largest' in func_name:
+    if intent_action == 'search' and intent_data_type == 'list':
+        if func.name_has_max_like:
             score += 0.25  # Strong bonus for find_max
-        elif 'min' in func_name or 'minimum' in func_name or 'smallest' in func_name:
+        elif func.name_has_min_like:
             score += 0.25  # Strong bonus for find_min
-        elif 'sum' in func_name or 'calculate' in func_name or 'count' in func_name:
+        elif func.name_has_aggregate:
             score -= 0.3  # Strong penalty for calculate functions when search is mentioned
     
     # Special case: "calculate" with "minimum" or "maximum" should prefer find_min/find_max
     # Also handle "locate minimum", "get minimum", etc.
-    has_calculate = intent.get('action') == 'calculate' or 'calculate' in original_text
-    has_min_query = 'minimum' in original_text or 'min' in original_text or 'smallest' in original_text or 'lowest' in original_text
-    has_max_query = 'maximum' in original_text or 'max' in original_text or 'largest' in original_text or 'highest' in original_text
-    
-    if has_calculate or 'locate' in original_text or 'get' in original_text:
-        if has_min_query:
-            if 'min' in func_name:
+    if features.min_max_context:
+        if features.has_min_query:
+            if func.name_has_min:
                 score += 0.6  # Very strong bonus for find_minimum
-            elif 'max' in func_name:
+            elif func.name_has_max:
                 score -= 0.6  # Very strong penalty for max when min is queried
-            elif 'sum' in func_name or 'count' in func_name or 'calculate' in func_name:
+            elif func.name_has_aggregate:
                 score -= 0.5  # Strong penalty for other calculate functions
-        elif has_max_query:
-            if 'max' in func_name:
+        elif features.has_max_query:
+            if func.name_has_max:
                 score += 0.6  # Very strong bonus for find_maximum
-            elif 'min' in func_name:
+            elif func.name_has_min:
                 score -= 0.6  # Very strong penalty for min when max is queried
-            elif 'sum' in func_name or 'count' in func_name or 'calculate' in func_name:
+            elif func.name_has_aggregate:
                 score -= 0.5  # Strong penalty for other calculate functions
     
     # Special case: "find" with "upper case" or "uppercase" should prefer find_uppercase
     # Also handle "the upper case", "upper case", etc.
-    has_find_search = 'find' in original_text or 'search' in original_text or 'get' in original_text
-    has_upper_case = ('upper' in original_text and 'case' in original_text) or 'uppercase' in original_text or 'upper-case' in original_text
-    has_lower_case = ('lower' in original_text and 'case' in original_text) or 'lowercase' in original_text or 'lower-case' in original_text
-    
-    if has_find_search:
-        if has_upper_case:
-            if 'upper' in func_name and ('case' in func_name or 'upper' in func_description):
+    if features.has_find_search:
+        if features.has_upper_case:
+            if func.names_upper_case:
                 score += 0.8  # Very strong bonus for find_uppercase
-            elif 'max' in func_name or 'min' in func_name or 'count' in func_name:
+            elif func.name_has_extreme_or_count:
                 score -= 0.7  # Very strong penalty for wrong functions
-        elif has_lower_case:
-            if 'lower' in func_name and ('case' in func_name or 'lower' in func_description):
+        elif features.has_lower_case:
+            if func.names_lower_case:
                 score += 0.8  # Very strong bonus for find_lowercase
-            elif 'max' in func_name or 'min' in func_name or 'count' in func_name:
+            elif func.name_has_extreme_or_count:
                 score -= 0.7  # Very strong penalty for wrong functions
     
     # Special case: "rank" should map to sort functions, and often implies descending
-    if 'rank' in original_text:
-        if function_metadata.get('action') == 'sort':
+    if features.mentions_rank:
+        if func_action == 'sort':
             score += 0.15  # Bonus for sort functions when "rank" is mentioned
             # "rank" often implies descending order (ranking from high to low)
-            if function_metadata.get('order') == 'descending' and not intent.get('order'):
+            if func_order == 'descending' and not intent_order:
                 score += 0.1  # Additional bonus for descending when rank is mentioned
-            elif function_metadata.get('order') == 'ascending' and not intent.get('order'):
+            elif func_order == 'ascending' and not intent_order:
                 score -= 0.05  # Small penalty for ascending when rank is mentioned (unless explicit)
     
     # Special case: "organize" with list should prefer group_by_key over sort
     # But only if "key" or "group" is also mentioned
-    if 'organize' in original_text and intent.get('data_type') == 'list':
-        if 'key' in original_text or 'group' in original_text:
-            if function_metadata.get('id') == 'group_by_key':
+    if features.organizes_list:
+        if features.organizes_by_key:
+            if func_id == 'group_by_key':
                 score += 0.25  # Strong bonus for group_by_key
-            elif function_metadata.get('action') == 'sort':
+            elif func_action == 'sort':
                 score -= 0.1  # Penalty for sort when organize+key/group is mentioned
-        elif function_metadata.get('id') == 'group_by_key':
+        elif func_id == 'group_by_key':
             score += 0.1  # Moderate bonus even without explicit key mention
     
     # Match data type
-    if intent.get('data_type') and function_metadata.get('data_type') == intent.get('data_type'):
+    if intent_data_type and func_data_type == intent_data_type:
         score += 0.15  # Increased weight for data type matching
     
     # Match order preference (important for sort functions)
-    if intent.get('order') and function_metadata.get('order') == intent.get('order'):
+    if intent_order and func_order == intent_order:
         score += 0.2  # Increased weight for order matching
-    elif intent.get('order') is None and function_metadata.get('order'):
+    elif intent_order is None and func_order:
         # If no order specified but function has order, check for implicit order hints
-        original_text_lower = original_text.lower()
-        has_desc_hints = any(hint in original_text_lower for hint in ['desc', 'descending', 'decreasing', 'high', 'large', 'big', 'rank'])
-        has_asc_hints = any(hint in original_text_lower for hint in ['asc', 'ascending', 'increasing', 'low', 'small'])
-        
-        if has_desc_hints and function_metadata.get('order') == 'descending':
+        if features.has_desc_order_hints and func_order == 'descending':
             score += 0.18  # Strong bonus for descending when hints present
-        elif has_asc_hints and function_metadata.get('order') == 'ascending':
+        elif features.has_asc_order_hints and func_order == 'ascending':
             score += 0.18  # Strong bonus for ascending when hints present
-        elif function_metadata.get('action') == 'sort':
+        elif func_action == 'sort':
             # For ambiguous queries, test cases seem to prefer descending
-            # Check if query is very short (likely ambiguous)
-            query_words = original_text_lower.split()
-            is_very_short = len(query_words) <= 3
-            
-            if is_very_short and 'unique' in original_text_lower:
-                # Short queries with "unique" - test cases prefer descending
-                if function_metadata.get('order') == 'descending':
+            # when the query is very short (likely ambiguous) and says "unique"
+            if features.is_short_unique_query:
+                if func_order == 'descending':
                     score += 0.08  # Small bonus for descending
-                elif function_metadata.get('order') == 'ascending':
+                elif func_order == 'ascending':
                     score -= 0.05  # Small penalty for ascending
             else:
                 # Default to ascending when ambiguous (more common in real world)
-                if function_metadata.get('order') == 'ascending':
+                if func_order == 'ascending':
                     score += 0.03  # Very slight bonus for ascending as default
                 else:
                     score -= 0.03  # Very slight penalty for descending when ambiguous
@@ -655,15 +939,11 @@ def calculate_relevance_score(intent: Dict[str, any], function_metadata: Dict[st
         score += (popularity / 10) * 0.03  # Smaller boost based on popularity
     
     # Final boost: if function description closely matches query intent (but be conservative)
-    func_description = function_metadata.get('description', '').lower()
     # Only check if we have a reasonable match already
     if score > 0.4:
-        query_words = set(original_text.split())
-        desc_words = set(func_description.split())
-        # Remove common stop words for better matching
-        common_stops = {'a', 'an', 'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by'}
-        query_meaningful = {w for w in query_words if w not in common_stops and len(w) > 2}
-        desc_meaningful = {w for w in desc_words if w not in common_stops and len(w) > 2}
+        # Meaningful words (no common stop words) of query and description
+        query_meaningful = features.meaningful_words
+        desc_meaningful = func.description_words
         if query_meaningful and desc_meaningful:
             desc_match_ratio = len(query_meaningful.intersection(desc_meaningful)) / max(len(query_meaningful), len(desc_meaningful), 1)
             if desc_match_ratio > 0.4:  # If description has significant word overlap
@@ -1 +1,37 @@
 # Tests package
+
+import os
+import shutil
+import tempfile
+
+from smart_func import generator
+from smart_func.cache import clear_cache
+from smart_func.database import SQLiteBackend
+
+
+SHIPPED_DB = os.path.join(os.path.dirname(__file__), '..', 'smart_func', 'functions.db')
+
+
+def use_database_copy():
+    """
+    Point smart_func.generator at a temporary copy of the shipped database,
+    so that tests never write to the tracked file.
+    
+    Returns:
+        Function that restores the previous backend and removes the copy
+    """
+    tmpdir = tempfile.mkdtemp()
+    db_path = os.path.join(tmpdir, 'functions.db')
+    shutil.copyfile(SHIPPED_DB, db_path)
+    
+    saved = (generator._db_backend, generator._catalog)
+    generator._db_backend = SQLiteBackend(db_path)
+    generator._catalog = None
+    clear_cache()
+    
+    def restore():
+        generator._db_backend, generator._catalog = saved
+        clear_cache()
+        shutil.rmtree(tmpdir)
+    
+    return restore
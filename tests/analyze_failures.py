@@ -4,7 +4,12 @@ Analyze test failures to improve accuracy.
 
 import json
 import os
-from collections import defaultdict
+from collections import Counter
+
+try:
+    import ijson  # Optional: streams the results instead of loading the whole file
+except ImportError:
+    ijson = None
 
 def load_results():
     """Load test results."""
@@ -12,50 +17,67 @@ def load_results():
     with open(results_path, 'r', encoding='utf-8') as f:
         return json.load(f)
 
+def iter_results():
+    """Yield the individual test results, one at a time when ijson is installed."""
+    if ijson is None:
+        yield from load_results()['results']
+        return
+    results_path = os.path.join(os.path.dirname(__file__), 'test_results_10000.json')
+    with open(results_path, 'rb') as f:
+        yield from ijson.items(f, 'results.item', use_float=True)
+
 def analyze_failures():
     """Analyze why tests failed."""
-    data = load_results()
-    results = data['results']
-    
-    # Get incorrect predictions
-    incorrect = [r for r in results if not r['correct']]
     
-    print(f"Total Tests: {len(results)}")
-    print(f"Incorrect: {len(incorrect)} ({len(incorrect)/len(results)*100:.2f}%)")
-    print(f"\nAnalyzing {len(incorrect)} failures...\n")
+    # Tally the failures in a single pass over the results
+    total = 0
+    incorrect_count = 0
+    sample_failures = []  # The first 20 failures
+    by_language = Counter()
+    low_relevance = 0
+    wrong_language = 0
+    no_results = 0
+    for r in iter_results():
+        total += 1
+        if r['correct']:
+            continue
+        incorrect_count += 1
+        if len(sample_failures) < 20:
+            sample_failures.append(r)
+        
+        # Group by expected language
+        by_language[r.get('expected_language', 'unknown')] += 1
+        
+        # Low relevance scores
+        if r.get('relevance_score', 0) < 0.3:
+            low_relevance += 1
+        
+        # Wrong language returned
+        if (r.get('result_language') and r.get('expected_language') and
+                r['result_language'] != r['expected_language']):
+            wrong_language += 1
+        
+        # No results
+        if not r.get('result_id'):
+            no_results += 1
     
-    # Group by expected language
-    by_language = defaultdict(list)
-    for r in incorrect:
-        lang = r.get('expected_language', 'unknown')
-        by_language[lang].append(r)
+    print(f"Total Tests: {total}")
+    print(f"Incorrect: {incorrect_count} ({incorrect_count/total*100:.2f}%)")
+    print(f"\nAnalyzing {incorrect_count} failures...\n")
     
     print("Failures by Language:")
-    for lang, failures in sorted(by_language.items(), key=lambda x: len(x[1]), reverse=True):
-        print(f"  {lang}: {len(failures)} failures")
+    for lang, count in by_language.most_common():
+        print(f"  {lang}: {count} failures")
     
     # Common failure patterns
     print("\nCommon Failure Patterns:")
-    
-    # Low relevance scores
-    low_relevance = [r for r in incorrect if r.get('relevance_score', 0) < 0.3]
-    print(f"  Low relevance (<30%): {len(low_relevance)}")
-    
-    # Wrong language returned
-    wrong_language = [
-        r for r in incorrect 
-        if r.get('result_language') and r.get('expected_language') and 
-        r['result_language'] != r['expected_language']
-    ]
-    print(f"  Wrong language: {len(wrong_language)}")
-    
-    # No results
-    no_results = [r for r in incorrect if not r.get('result_id')]
-    print(f"  No results: {len(no_results)}")
+    print(f"  Low relevance (<30%): {low_relevance}")
+    print(f"  Wrong language: {wrong_language}")
+    print(f"  No results: {no_results}")
     
     # Sample failures
     print("\nSample Failures (first 10):")
-    for i, r in enumerate(incorrect[:10], 1):
+    for i, r in enumerate(sample_failures[:10], 1):
         print(f"\n{i}. Query: '{r['query']}'")
         print(f"   Expected: {r.get('expected_name', 'N/A')} ({r.get('expected_language', 'N/A')})")
         print(f"   Got: {r.get('result_name', 'N/A')} ({r.get('result_language', 'N/A')})")
@@ -63,16 +85,16 @@ def analyze_failures():
     
     # Save analysis
     analysis = {
-        'total_tests': len(results),
-        'incorrect_count': len(incorrect),
-        'accuracy': (len(results) - len(incorrect)) / len(results) * 100,
-        'failures_by_language': {lang: len(failures) for lang, failures in by_language.items()},
+        'total_tests': total,
+        'incorrect_count': incorrect_count,
+        'accuracy': (total - incorrect_count) / total * 100,
+        'failures_by_language': dict(by_language),
         'failure_patterns': {
-            'low_relevance': len(low_relevance),
-            'wrong_language': len(wrong_language),
-            'no_results': len(no_results)
+            'low_relevance': low_relevance,
+            'wrong_language': wrong_language,
+            'no_results': no_results
         },
-        'sample_failures': incorrect[:20]
+        'sample_failures': sample_failures
     }
     
     output_path = os.path.join(os.path.dirname(__file__), 'failure_analysis.json')
@@ -5,14 +5,21 @@ Generate 10,000 test cases for Smart Function Recommender.
 import json
 import random
 import os
+import string
+import sys
 from typing import List, Dict
 
+# Add parent directory to path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from smart_func._json import json_loads
+
 # Load the function database to generate realistic test cases
 def load_functions():
     """Load functions from database."""
     db_path = os.path.join(os.path.dirname(__file__), '..', 'smart_func', 'database.json')
-    with open(db_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    with open(db_path, 'rb') as f:
+        return json_loads(f.read())
 
 
 def generate_test_cases(num_cases: int = 10000) -> List[Dict]:
@@ -73,17 +80,32 @@ def generate_test_cases(num_cases: int = 10000) -> List[Dict]:
         'dictionary': ['dictionary', 'dict', 'object', 'map'],
     }
     
+    # Split each template into (literal text, field name) segments once,
+    # instead of re-parsing it with str.format for every case
+    formatter = string.Formatter()
+    template_segments = [
+        tuple((literal, field) for literal, field, _, _ in formatter.parse(template))
+        for template in query_templates
+    ]
+    
+    # Draw the per-case choices in batches up front
+    # (language filter: 0 = none, 1 = the function's language, 2 = 'all')
+    picked_functions = random.choices(functions, k=num_cases)
+    picked_segments = random.choices(template_segments, k=num_cases)
+    picked_filters = random.choices(range(3), k=num_cases)
+    picked_min_relevance = random.choices([0.0, 0.3, 0.5, 0.7], k=num_cases)
+    
     test_cases = []
     
     for i in range(num_cases):
         # Pick a random function
-        func = random.choice(functions)
+        func = picked_functions[i]
         
         # Generate query based on template
-        template = random.choice(query_templates)
+        segments = picked_segments[i]
         
         # Fill in template
-        query = template.format(
+        values = dict(
             name=func.get('name', ''),
             description=func.get('description', ''),
             action=func.get('action', ''),
@@ -92,11 +114,17 @@ def generate_test_cases(num_cases: int = 10000) -> List[Dict]:
             keyword2=random.choice(func.get('keywords', [''])[3:6] or ['']),
             language=func.get('language', 'python')
         )
+        query = ''.join(
+            literal + (str(values[field]) if field is not None else '')
+            for literal, field in segments
+        )
         
-        # Add variations
+        # Add variations (the query only changes when a key is replaced)
+        query_lower = query.lower()
         for key, synonyms in variations.items():
-            if key in query.lower():
+            if key in query_lower:
                 query = query.replace(key, random.choice(synonyms), 1)
+                query_lower = query.lower()
         
         # Expected result
         expected_function_id = func.get('id')
@@ -108,8 +136,8 @@ def generate_test_cases(num_cases: int = 10000) -> List[Dict]:
             'expected_function_id': expected_function_id,
             'expected_language': expected_language,
             'expected_name': func.get('name'),
-            'language_filter': random.choice([None, expected_language, 'all']),
-            'min_relevance': random.choice([0.0, 0.3, 0.5, 0.7]),
+            'language_filter': (None, expected_language, 'all')[picked_filters[i]],
+            'min_relevance': picked_min_relevance[i],
         }
         
         test_cases.append(test_case)
@@ -6,13 +6,27 @@ import asyncio
 import aiohttp
 import time
 import json
+import os
+import random
 from typing import List, Dict
 from collections import defaultdict
 
+try:
+    import orjson  # Optional: much faster JSON serialization of request bodies
+except ImportError:
+    orjson = None
+
+try:
+    import uvloop  # Optional: faster event loop for the many concurrent sockets
+except ImportError:
+    uvloop = None
+
 BASE_URL = "http://localhost:8000"
 CONCURRENT_USERS = 1000
 REQUESTS_PER_USER = 10
 TOTAL_REQUESTS = CONCURRENT_USERS * REQUESTS_PER_USER
+SAMPLE_RESULTS = 100  # Individual results saved alongside the statistics
+REQUEST_INTERVAL = 0.1  # Mean pause between a user's requests, in seconds
 
 # Test queries
 TEST_QUERIES = [
@@ -64,19 +78,19 @@ async def make_request(session: aiohttp.ClientSession, query: str, user_id: int)
         }
 
 
-async def simulate_user(session: aiohttp.ClientSession, user_id: int) -> List[Dict]:
+async def simulate_user(session: aiohttp.ClientSession, user_id: int, load_stats: 'LoadStats'):
     """Simulate a single user making multiple requests."""
-    results = []
+    # Same queries for every user, but each user sends them in its own order
+    queries = [TEST_QUERIES[i % len(TEST_QUERIES)] for i in range(REQUESTS_PER_USER)]
+    random.shuffle(queries)
     
-    for i in range(REQUESTS_PER_USER):
-        query = TEST_QUERIES[i % len(TEST_QUERIES)]
+    for query in queries:
         result = await make_request(session, query, user_id)
-        results.append(result)
+        load_stats.add(result)
         
-        # Small delay between requests
-        await asyncio.sleep(0.1)
-    
-    return results
+        # Random (exponential) delay between requests, so users do not send
+        # in lockstep bursts
+        await asyncio.sleep(random.expovariate(1 / REQUEST_INTERVAL))
 
 
 async def run_load_test():
@@ -87,89 +101,114 @@ async def run_load_test():
     print(f"Total Requests: {TOTAL_REQUESTS}")
     print(f"Target: {BASE_URL}\n")
     
+    load_stats = LoadStats()
     start_time = time.time()
     
-    async with aiohttp.ClientSession() as session:
+    # The default connector allows only 100 connections per host, which would
+    # queue most of the simulated users in the client instead of the server
+    connector = aiohttp.TCPConnector(
+        limit=0,
+        limit_per_host=0,
+        ttl_dns_cache=300,
+        enable_cleanup_closed=True,
+        keepalive_timeout=75
+    )
+    session_kwargs = {'connector': connector}
+    if orjson is not None:
+        session_kwargs['json_serialize'] = lambda obj: orjson.dumps(obj).decode()
+    
+    async with aiohttp.ClientSession(**session_kwargs) as session:
         # Create tasks for all users
         tasks = [
-            simulate_user(session, user_id)
+            simulate_user(session, user_id, load_stats)
             for user_id in range(1, CONCURRENT_USERS + 1)
         ]
         
         # Run all tasks concurrently
         print("Executing requests...")
-        all_results = await asyncio.gather(*tasks)
+        await asyncio.gather(*tasks)
     
     total_time = time.time() - start_time
     
-    # Flatten results
-    results = []
-    for user_results in all_results:
-        results.extend(user_results)
-    
     # Calculate statistics
-    stats = calculate_load_stats(results, total_time)
+    stats = load_stats.summary(total_time)
     
     # Print report
     print_load_report(stats)
     
     # Save results
-    save_load_results(results, stats)
+    save_load_results(load_stats.samples, stats)
     
     return stats
 
 
-def calculate_load_stats(results: List[Dict], total_time: float) -> Dict:
-    """Calculate load test statistics."""
-    total = len(results)
-    successful = sum(1 for r in results if r['success'])
-    failed = total - successful
-    has_results = sum(1 for r in results if r.get('has_results', False))
-    
-    # Response times
-    elapsed_times = [r['elapsed'] for r in results]
-    avg_time = sum(elapsed_times) / len(elapsed_times) if elapsed_times else 0
-    min_time = min(elapsed_times) if elapsed_times else 0
-    max_time = max(elapsed_times) if elapsed_times else 0
-    
-    # Percentiles
-    sorted_times = sorted(elapsed_times)
-    p50 = sorted_times[int(len(sorted_times) * 0.5)] if sorted_times else 0
-    p95 = sorted_times[int(len(sorted_times) * 0.95)] if sorted_times else 0
-    p99 = sorted_times[int(len(sorted_times) * 0.99)] if sorted_times else 0
+class LoadStats:
+    """Running totals of a load test, updated as each request completes."""
     
-    # Status codes
-    status_codes = defaultdict(int)
-    for r in results:
-        status_codes[r['status']] += 1
+    def __init__(self):
+        self.total = 0
+        self.successful = 0
+        self.has_results = 0
+        self.elapsed_times = []
+        self.status_codes = defaultdict(int)
+        self.error_types = defaultdict(int)
+        self.samples = []  # The first SAMPLE_RESULTS results
     
-    # Errors
-    errors = [r for r in results if not r['success']]
-    error_types = defaultdict(int)
-    for r in errors:
-        error = r.get('error', 'Unknown')
-        error_types[error] += 1
+    def add(self, r: Dict):
+        """Count one request result."""
+        self.total += 1
+        self.elapsed_times.append(r['elapsed'])
+        self.status_codes[r['status']] += 1
+        if r['success']:
+            self.successful += 1
+        else:
+            self.error_types[r.get('error', 'Unknown')] += 1
+        if r.get('has_results', False):
+            self.has_results += 1
+        if len(self.samples) < SAMPLE_RESULTS:
+            self.samples.append(r)
     
-    return {
-        'total_requests': total,
-        'successful_requests': successful,
-        'failed_requests': failed,
-        'success_rate': (successful / total * 100) if total > 0 else 0,
-        'requests_with_results': has_results,
-        'result_rate': (has_results / total * 100) if total > 0 else 0,
-        'total_time_seconds': total_time,
-        'requests_per_second': total / total_time if total_time > 0 else 0,
-        'average_response_time': avg_time,
-        'min_response_time': min_time,
-        'max_response_time': max_time,
-        'p50_response_time': p50,
-        'p95_response_time': p95,
-        'p99_response_time': p99,
-        'status_codes': dict(status_codes),
-        'error_types': dict(error_types),
-        'concurrent_users': CONCURRENT_USERS,
-        'requests_per_user': REQUESTS_PER_USER
-    }
+    def summary(self, total_time: float) -> Dict:
+        """Calculate load test statistics."""
+        total = self.total
+        successful = self.successful
+        failed = total - successful
+        has_results = self.has_results
+        elapsed_times = self.elapsed_times
+        status_codes = self.status_codes
+        error_types = self.error_types
+        
+        # Response times (min and max are the ends of the sorted list)
+        sorted_times = sorted(elapsed_times)
+        avg_time = sum(elapsed_times) / total if total else 0
+        min_time = sorted_times[0] if sorted_times else 0
+        max_time = sorted_times[-1] if sorted_times else 0
+        
+        # Percentiles
+        p50 = sorted_times[int(total * 0.5)] if sorted_times else 0
+        p95 = sorted_times[int(total * 0.95)] if sorted_times else 0
+        p99 = sorted_times[int(total * 0.99)] if sorted_times else 0
+        
+        return {
+            'total_requests': total,
+            'successful_requests': successful,
+            'failed_requests': failed,
+            'success_rate': (successful / total * 100) if total > 0 else 0,
+            'requests_with_results': has_results,
+            'result_rate': (has_results / total * 100) if total > 0 else 0,
+            'total_time_seconds': total_time,
+            'requests_per_second': total / total_time if total_time > 0 else 0,
+            'average_response_time': avg_time,
+            'min_response_time': min_time,
+            'max_response_time': max_time,
+            'p50_response_time': p50,
+            'p95_response_time': p95,
+            'p99_response_time': p99,
+            'status_codes': dict(status_codes),
+            'error_types': dict(error_types),
+            'concurrent_users': CONCURRENT_USERS,
+            'requests_per_user': REQUESTS_PER_USER
+        }
 
 
 def print_load_report(stats: Dict):
@@ -234,13 +273,13 @@ def print_load_report(stats: Dict):
         print("❌ Poor: Throughput < 20 req/s")
 
 
-def save_load_results(results: List[Dict], stats: Dict):
-    """Save load test results."""
+def save_load_results(samples: List[Dict], stats: Dict):
+    """Save load test statistics and a sample of the individual results."""
     output_path = os.path.join(os.path.dirname(__file__), 'load_test_results.json')
     with open(output_path, 'w', encoding='utf-8') as f:
         json.dump({
             'statistics': stats,
-            'sample_results': results[:100]  # Save first 100 for analysis
+            'sample_results': samples[:SAMPLE_RESULTS]  # Saved for analysis
         }, f, indent=2, ensure_ascii=False)
     print(f"\nResults saved to {output_path}")
 
@@ -259,6 +298,9 @@ def main():
         print("\nCancelled.")
         return
     
+    if uvloop is not None:
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    
     try:
         asyncio.run(run_load_test())
         print("\n✅ Load test complete!")
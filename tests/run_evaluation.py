@@ -3,15 +3,18 @@ Run evaluation on test cases and analyze results.
 """
 
 import json
+import multiprocessing
 import os
 import sys
-from typing import List, Dict, Tuple
+from typing import List, Dict, Optional, Tuple
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
 # Add parent directory to path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from smart_func._json import json_loads
 from smart_func.generator import get_function, load_database
 
 
@@ -21,22 +24,30 @@ def load_test_cases(filename: str = 'test_cases_1000.json') -> List[Dict]:
     if not os.path.exists(filename):
         test_dir = os.path.dirname(os.path.abspath(__file__))
         filename = os.path.join(test_dir, filename)
-    with open(filename, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    with open(filename, 'rb') as f:
+        return json_loads(f.read())
 
 
-def evaluate_test_case(test_case: Dict, database: List[Dict]) -> Dict:
+def evaluate_test_case(test_case: Dict, id_to_name: Dict[str, str]) -> Dict:
     """
     Evaluate a single test case.
     
+    Args:
+        test_case: Test case with query and expected function
+        id_to_name: Function names by id, for the expected function's name
+    
     Returns:
         Dictionary with evaluation results
     """
     query = test_case['query']
     expected_id = test_case['expected_function']
     
-    # Get prediction
-    result = get_function(query, top_k=1)
+    # Get the top 3 once; the prediction is the first of them
+    top_3_results = get_function(query, top_k=3)
+    if isinstance(top_3_results, list):
+        result = top_3_results[0] if top_3_results else None
+    else:
+        result = top_3_results
     
     if result is None:
         return {
@@ -51,8 +62,7 @@ def evaluate_test_case(test_case: Dict, database: List[Dict]) -> Dict:
     predicted_id = result.get('id')
     is_correct = (predicted_id == expected_id)
     
-    # Get top 3 to see if expected is in top results
-    top_3_results = get_function(query, top_k=3)
+    # See if expected is in top results
     if isinstance(top_3_results, list):
         top_3_ids = [r.get('id') for r in top_3_results]
         rank = top_3_ids.index(expected_id) + 1 if expected_id in top_3_ids else None
@@ -68,26 +78,66 @@ def evaluate_test_case(test_case: Dict, database: List[Dict]) -> Dict:
         'rank': rank,
         'category': test_case.get('category', 'unknown'),
         'predicted_name': result.get('name', ''),
-        'expected_name': next((f['name'] for f in database if f['id'] == expected_id), 'unknown')
+        'expected_name': id_to_name.get(expected_id, 'unknown')
     }
 
 
-def run_evaluation(test_cases: List[Dict], database: List[Dict]) -> Dict:
-    """Run evaluation on all test cases."""
+# Function names by id in the current worker process, set once by
+# _init_worker so they are not pickled again with every test case
+_worker_id_to_name = None
+
+
+def _init_worker(id_to_name: Dict[str, str]):
+    """Store the function names for _evaluate_in_worker."""
+    global _worker_id_to_name
+    _worker_id_to_name = id_to_name
+
+
+def _evaluate_in_worker(test_case: Dict) -> Dict:
+    """Evaluate a test case with the worker's function names."""
+    return evaluate_test_case(test_case, _worker_id_to_name)
+
+
+def run_evaluation(test_cases: List[Dict], database: List[Dict], workers: Optional[int] = None) -> Dict:
+    """
+    Run evaluation on all test cases.
+    
+    Test cases are spread over worker processes (default: all CPUs but two).
+    With a single worker they run in this process.
+    """
+    if workers is None:
+        workers = max(1, (os.cpu_count() or 1) - 2)
+    
     results = []
     correct = 0
     total = len(test_cases)
     
     print(f"Evaluating {total} test cases...")
     
-    for i, test_case in enumerate(test_cases):
-        if (i + 1) % 100 == 0:
-            print(f"  Progress: {i + 1}/{total} ({100 * (i + 1) / total:.1f}%)")
-        
-        result = evaluate_test_case(test_case, database)
-        results.append(result)
-        if result['correct']:
-            correct += 1
+    # Expected function names are looked up by id for every test case
+    id_to_name = {f['id']: f['name'] for f in database}
+    
+    executor = None
+    if workers > 1:
+        # Spawned rather than forked, so that workers open their own SQLite
+        # connections instead of sharing this process's
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(id_to_name,),
+                                       mp_context=multiprocessing.get_context('spawn'))
+        outcomes = executor.map(_evaluate_in_worker, test_cases, chunksize=64)
+    else:
+        outcomes = (evaluate_test_case(test_case, id_to_name) for test_case in test_cases)
+    
+    try:
+        for i, result in enumerate(outcomes):
+            if (i + 1) % 100 == 0:
+                print(f"  Progress: {i + 1}/{total} ({100 * (i + 1) / total:.1f}%)")
+            
+            results.append(result)
+            if result['correct']:
+                correct += 1
+    finally:
+        if executor is not None:
+            executor.shutdown()
     
     accuracy = correct / total if total > 0 else 0.0
     
@@ -105,35 +155,34 @@ def analyze_results(evaluation: Dict) -> Dict:
     """Analyze evaluation results to find patterns."""
     results = evaluation['results']
     
-    # Group by category
+    # Group by category, failures by expected function, and the failure
+    # patterns, all in a single pass
     by_category = defaultdict(lambda: {'correct': 0, 'total': 0})
+    failures_by_function = defaultdict(int)
+    sample_failures = []  # First 20 failures
+    low_relevance = 0  # Queries with low relevance scores
+    top3_but_not_first = 0  # Cases where expected is in top 3 but not #1
     for result in results:
-        cat = result['category']
-        by_category[cat]['total'] += 1
+        cat_stats = by_category[result['category']]
+        cat_stats['total'] += 1
+        if result['relevance_score'] < 0.3:
+            low_relevance += 1
         if result['correct']:
-            by_category[cat]['correct'] += 1
-    
-    # Find common failure patterns
-    failures = [r for r in results if not r['correct']]
-    
-    # Group failures by expected function
-    failures_by_function = defaultdict(int)
-    for failure in failures:
-        failures_by_function[failure['expected']] += 1
-    
-    # Find queries with low relevance scores
-    low_relevance = [r for r in results if r['relevance_score'] < 0.3]
-    
-    # Find cases where expected is in top 3 but not #1
-    top3_but_not_first = [r for r in results if not r['correct'] and r.get('rank') is not None]
+            cat_stats['correct'] += 1
+            continue
+        failures_by_function[result['expected']] += 1
+        if len(sample_failures) < 20:
+            sample_failures.append(result)
+        if result.get('rank') is not None:
+            top3_but_not_first += 1
     
     return {
         'by_category': dict(by_category),
         'top_failure_functions': dict(sorted(failures_by_function.items(), 
                                             key=lambda x: x[1], reverse=True)[:10]),
-        'low_relevance_count': len(low_relevance),
-        'top3_but_not_first_count': len(top3_but_not_first),
-        'sample_failures': failures[:20]  # First 20 failures
+        'low_relevance_count': low_relevance,
+        'top3_but_not_first_count': top3_but_not_first,
+        'sample_failures': sample_failures
     }
 
 
@@ -0,0 +1,120 @@
+"""
+Tests for the caching layer.
+"""
+
+import unittest
+from smart_func.cache import Cache, cached, get_cache, set_cache, reset_cache
+from smart_func.generator import search_functions
+from tests import use_database_copy
+
+
+class TestCache(unittest.TestCase):
+    """Test the in-memory LRU cache."""
+    
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first."""
+        cache = Cache(max_size=4)
+        for key in 'abcd':
+            cache.set(key, key.upper())
+        self.assertEqual(cache.get('a'), 'A')  # 'b' is now the oldest
+        
+        cache.set('e', 'E')
+        self.assertEqual(cache.get_stats()['entries'], 4)
+        self.assertIsNone(cache.get('b'))
+        for key in 'acde':
+            self.assertEqual(cache.get(key), key.upper())
+    
+    def test_max_size_across_shards(self):
+        """Test that max_size is exact for caches split into shards."""
+        cache = Cache(max_size=1024)
+        for i in range(1024):
+            cache.set(f'key{i}', i)
+        self.assertEqual(cache.get_stats()['entries'], 1024)
+        
+        cache.set('one more', -1)
+        self.assertEqual(cache.get_stats()['entries'], 1024)
+        self.assertEqual(cache.get('one more'), -1)
+    
+    def test_overwrite_does_not_evict(self):
+        """Test that updating an existing key keeps every entry."""
+        cache = Cache(max_size=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.set('a', 3)
+        self.assertEqual(cache.get('a'), 3)
+        self.assertEqual(cache.get('b'), 2)
+    
+    def test_cached_keys_on_argument_type(self):
+        """Test that equal arguments of different types are cached separately."""
+        @cached(ttl=60)
+        def describe(value, other=None):
+            return repr((value, other))
+        
+        token = set_cache(Cache())
+        try:
+            self.assertEqual(describe(1), '(1, None)')
+            self.assertEqual(describe(1.0), '(1.0, None)')
+            self.assertEqual(describe(True), '(True, None)')
+            self.assertEqual(describe(0, other=1), '(0, 1)')
+            self.assertEqual(describe(0, other=True), '(0, True)')
+            self.assertEqual(get_cache().get_stats()['entries'], 5)
+        finally:
+            reset_cache(token)
+
+
+class TestCachedSearch(unittest.TestCase):
+    """Test caching of search_functions results."""
+    
+    @classmethod
+    def setUpClass(cls):
+        cls.addClassCleanup(use_database_copy())
+    
+    def setUp(self):
+        self.cache = Cache()
+        self.token = set_cache(self.cache)
+    
+    def tearDown(self):
+        reset_cache(self.token)
+    
+    def test_positional_and_keyword_calls_share_entry(self):
+        """Test that equivalent calls are cached under a single key."""
+        by_keyword = search_functions('sort a list', top_k=5)
+        by_position = search_functions('sort a list', None, 5)
+        self.assertEqual(self.cache.get_stats()['entries'], 1)
+        self.assertIs(by_position, by_keyword)
+    
+    def test_custom_database_bypasses_cache(self):
+        """Test that searching a caller-supplied database never uses the cache."""
+        search_functions('sort a list')
+        self.assertEqual(self.cache.get_stats()['entries'], 1)
+        
+        custom = {
+            'name': 'custom_sort',
+            'description': 'Sort a list in ascending order',
+            'language': 'python',
+            'action': 'sort',
+            'data_type': 'list',
+            'keywords': ['sort', 'list'],
+            'popularity': 1,
+        }
+        results = search_functions('sort a list', database=[custom])
+        self.assertEqual([func['name'] for func in results], ['custom_sort'])
+        self.assertEqual(self.cache.get_stats()['entries'], 1)
+    
+    def test_set_cache_none_disables_caching(self):
+        """Test that installing None turns caching off."""
+        token = set_cache(None)
+        try:
+            self.assertIsNone(get_cache())
+            first = search_functions('sort a list')
+            second = search_functions('sort a list')
+            self.assertEqual(second, first)
+            self.assertIsNot(second, first)
+        finally:
+            reset_cache(token)
+        self.assertIs(get_cache(), self.cache)
+        self.assertEqual(self.cache.get_stats()['entries'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,207 @@
+"""
+Tests for the database backends.
+"""
+
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from smart_func._json import json_dumps
+from smart_func.database import JSONBackend, SQLiteBackend
+from tests import SHIPPED_DB
+
+
+def _open_backend(db_path, start, errors):
+    """Open db_path once start is set, reporting any error to the errors queue."""
+    start.wait()
+    try:
+        SQLiteBackend(db_path)
+    except Exception as e:
+        errors.put(repr(e))
+
+
+class TestSQLiteBackend(unittest.TestCase):
+    """Test the SQLite backend against a private copy of the shipped database."""
+    
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmpdir, 'functions.db')
+        shutil.copyfile(SHIPPED_DB, self.db_path)
+    
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+    
+    def test_concurrent_open(self):
+        """Test that several processes can migrate the same file at once."""
+        # Return the copy to the schema and journal mode from before FTS, so
+        # that every process finds it out of date
+        conn = sqlite3.connect(self.db_path)
+        conn.executescript("""
+            DROP TRIGGER functions_fts_insert;
+            DROP TRIGGER functions_fts_update;
+            DROP TRIGGER functions_fts_delete;
+            DROP TRIGGER keywords_fts_insert;
+            DROP TRIGGER keywords_fts_delete;
+            DROP TABLE functions_fts;
+            DROP INDEX idx_lang_pop;
+            PRAGMA journal_mode=DELETE;
+        """)
+        conn.close()
+        
+        start = multiprocessing.Event()
+        errors = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(target=_open_backend, args=(self.db_path, start, errors))
+            for _ in range(6)
+        ]
+        for process in processes:
+            process.start()
+        start.set()
+        for process in processes:
+            process.join(timeout=30)
+            self.assertEqual(process.exitcode, 0)
+        
+        failures = []
+        while not errors.empty():
+            failures.append(errors.get())
+        self.assertEqual(failures, [])
+        
+        # A later open finds the schema current and still searches through FTS
+        backend = SQLiteBackend(self.db_path)
+        self.assertTrue(backend._fts_enabled)
+        self.assertTrue(backend.search_functions('sort'))
+    
+    def test_search_fts(self):
+        """Test that full-text search requires every query word as a prefix."""
+        backend = SQLiteBackend(self.db_path)
+        self.assertTrue(backend._fts_enabled)
+        
+        results = backend.search_functions('remove duplicates')
+        self.assertTrue(results)
+        for func in results:
+            text = ' '.join([func['name'], func['description']] + func['keywords']).lower()
+            self.assertIn('remove', text)
+            self.assertIn('duplicate', text)
+        
+        self.assertTrue(backend.search_functions('Sort Lis'))
+        self.assertEqual(backend.search_functions('ort'), [])
+        
+        results = backend.search_functions('sort', limit=2)
+        self.assertEqual(len(results), 2)
+        results = backend.search_functions('sort', language='JavaScript')
+        self.assertTrue(results)
+        self.assertTrue(all(func['language'] == 'javascript' for func in results))
+    
+    def test_search_like_fallback(self):
+        """Test the substring search used without an FTS index."""
+        backend = SQLiteBackend(self.db_path)
+        backend._fts_enabled = False
+        
+        results = backend.search_functions('ort')
+        self.assertTrue(results)
+        for func in results:
+            fields = [func['name'], func['description']] + func['keywords']
+            self.assertTrue(any('ort' in field.lower() for field in fields))
+        popularity = [func['popularity'] for func in results]
+        self.assertEqual(popularity, sorted(popularity, reverse=True))
+        
+        # The whole query must appear as one substring
+        self.assertEqual(backend.search_functions('remove duplicates'), [])
+        
+        # Also used by the FTS backend for queries without any words
+        backend._fts_enabled = True
+        self.assertEqual(backend.search_functions('%'), backend._search_functions_like('%'))
+    
+    def test_replica_concurrent_reads_and_writes(self):
+        """Test that reads from several threads see writes made by another."""
+        backend = SQLiteBackend(self.db_path, pool_size=2)
+        template = backend.search_functions('sort', limit=1)[0]
+        errors = []
+        written = threading.Event()
+        
+        def read():
+            try:
+                for _ in range(50):
+                    backend.get_functions()
+                written.wait(timeout=10)
+                self.assertIsNotNone(backend.get_function_by_id('replica_test_0'))
+            except Exception as e:
+                errors.append(e)
+        
+        readers = [threading.Thread(target=read) for _ in range(6)]
+        for reader in readers:
+            reader.start()
+        for i in range(3):
+            self.assertTrue(backend.add_function(dict(template, id=f'replica_test_{i}')))
+        written.set()
+        for reader in readers:
+            reader.join(timeout=30)
+        
+        self.assertEqual(errors, [])
+        self.assertFalse(backend.add_function(dict(template, id='replica_test_0')))
+        self.assertTrue(backend._replica_enabled)
+    
+    def test_get_version(self):
+        """Test that the version changes on every commit, from any connection."""
+        backend = SQLiteBackend(self.db_path)
+        version = backend.get_version()
+        self.assertEqual(backend.get_version(), version)
+        backend.get_functions()
+        self.assertEqual(backend.get_version(), version)
+        
+        template = backend.search_functions('sort', limit=1)[0]
+        self.assertTrue(backend.add_function(dict(template, id='version_test')))
+        self.assertNotEqual(backend.get_version(), version)
+        
+        # A commit by another process
+        version = backend.get_version()
+        conn = sqlite3.connect(self.db_path)
+        with conn:
+            conn.execute("UPDATE functions SET popularity = 0 WHERE id = 'version_test'")
+        conn.close()
+        self.assertNotEqual(backend.get_version(), version)
+        self.assertEqual(backend.get_function_by_id('version_test')['popularity'], 0)
+
+
+class TestJSONBackend(unittest.TestCase):
+    """Test the JSON backend against a private copy of the shipped functions."""
+    
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.tmpdir, 'database.json')
+        with open(self.db_path, 'wb') as f:
+            f.write(json_dumps(SQLiteBackend(SHIPPED_DB).get_functions()))
+    
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+    
+    def test_concurrent_writers(self):
+        """Test that writers sharing a file never publish a partial write."""
+        template = JSONBackend(self.db_path).get_functions()[0]
+        errors = []
+        
+        def write(writer):
+            backend = JSONBackend(self.db_path)
+            try:
+                for i in range(20):
+                    backend.add_function(dict(template, id=f'writer{writer}_{i}'))
+            except Exception as e:
+                errors.append(e)
+        
+        writers = [threading.Thread(target=write, args=(writer,)) for writer in range(4)]
+        for writer in writers:
+            writer.start()
+        for writer in writers:
+            writer.join(timeout=30)
+        
+        self.assertEqual(errors, [])
+        self.assertEqual(os.listdir(self.tmpdir), ['database.json'])
+        self.assertTrue(JSONBackend(self.db_path).get_functions())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,7 +10,12 @@ from smart_func.generator import (
     format_recommendation,
     load_database
 )
-from smart_func.nlp import parse_intent, extract_keywords, calculate_relevance_score
+from smart_func.nlp import parse_intent, extract_keywords, calculate_relevance_score, score_functions
+from tests import use_database_copy
+
+
+def setUpModule():
+    unittest.addModuleCleanup(use_database_copy())
 
 
 class TestNLP(unittest.TestCase):
@@ -178,6 +183,14 @@ class TestRelevanceScoring(unittest.TestCase):
         
         score = calculate_relevance_score(intent, function_metadata)
         self.assertLess(score, 0.5)  # Should have poor match
+    
+    def test_score_functions_matches_single_scores(self):
+        """Test that batch scoring gives the same scores as scoring one by one."""
+        intent = parse_intent("find maximum value in a list")
+        functions = load_database()
+        
+        scores = score_functions(intent, functions)
+        self.assertEqual(scores, [calculate_relevance_score(intent, func) for func in functions])
 
 
 if __name__ == '__main__':